@@ -1,6 +1,64 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 from django.utils.html import format_html
 from .models import Course, Lesson, Enrollment, LessonProgress, Instructor
+from .ordering import reorder_lessons
+from .pagination import EstimatedCountPaginator
+
+
+class RelatedIdFilter(admin.SimpleListFilter):
+    """
+    Filter on a foreign key by typing the related row's id, instead of
+    listing every related row in the sidebar. Subclasses set ``model``,
+    ``parameter_name`` (the foreign key's ``_id`` column) and ``title``.
+    """
+    template = 'admin/courses/id_filter.html'
+    model = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def value(self):
+        value = super().value()
+        return value if value and value.isdigit() else None
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        self.hidden_params = [
+            (name, value) for name, value in changelist.params.items()
+            if name not in (self.parameter_name, PAGE_VAR)
+        ]
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+        }
+        if self.value():
+            selected = self.model._default_manager.filter(pk=self.value()).first()
+            yield {
+                'selected': True,
+                'query_string': changelist.get_query_string({self.parameter_name: self.value()}),
+                'display': str(selected) if selected else f'#{self.value()} (not found)',
+            }
+
+
+class CourseIdFilter(RelatedIdFilter):
+    title = 'course'
+    parameter_name = 'course_id'
+    model = Course
+
+
+class InstructorIdFilter(RelatedIdFilter):
+    title = 'instructor'
+    parameter_name = 'instructor_id'
+    model = Instructor
 
 
 @admin.register(Instructor)
@@ -16,10 +74,6 @@ class InstructorAdmin(admin.ModelAdmin):
         return "No image"
     profile_pic_preview.short_description = 'Profile'
 
-    def course_count(self, obj):
-        return obj.courses.count()
-    course_count.short_description = 'Courses'
-
 
 class LessonInline(admin.TabularInline):
     """Inline admin for lessons within a course."""
@@ -31,32 +85,73 @@ class LessonInline(admin.TabularInline):
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     """Admin configuration for Course model."""
-    list_display = ['title', 'thumbnail_preview', 'instructor', 'short_description', 'created_at', 'lesson_count']
+    list_display = ['title', 'thumbnail_preview', 'instructor', 'short_description', 'created_at', 'lesson_count', 'enrollment_count']
+    list_select_related = ['instructor']
     search_fields = ['title', 'short_description', 'instructor__name']
-    list_filter = ['instructor', 'created_at']
+    list_filter = [InstructorIdFilter, 'created_at']
+    autocomplete_fields = ['instructor']
     inlines = [LessonInline]
 
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not Lesson:
+            return super().save_formset(request, form, formset, change)
+        # Apply position changes together in one bulk_update; saving the
+        # lessons one by one would trip the unique (course, order) constraint
+        # whenever two lessons swap places.
+        lessons = formset.save(commit=False)
+        if formset.deleted_objects:
+            # One delete, so the course's enrollments are recounted once.
+            Lesson.objects.filter(pk__in=[lesson.pk for lesson in formset.deleted_objects]).delete()
+        reorder_lessons(form.instance, {
+            lesson.pk: lesson.order
+            for lesson, changed in formset.changed_objects
+            if 'order' in changed and lesson.order is not None
+        })
+        moved_only = {lesson.pk for lesson, changed in formset.changed_objects if changed == ['order']}
+        for lesson in lessons:
+            if lesson.pk not in moved_only:
+                lesson.save()
+        formset.save_m2m()
+
     def thumbnail_preview(self, obj):
         if obj.thumbnail_url:
             return format_html('<img src="{}" width="60" height="40" style="border-radius: 4px; object-fit: cover;" />', obj.thumbnail_url)
         return "No image"
     thumbnail_preview.short_description = 'Thumbnail'
 
-    def lesson_count(self, obj):
-        return obj.lessons.count()
-    lesson_count.short_description = 'Lessons'
+
+class HasVideoFilter(admin.SimpleListFilter):
+    """Filter on the indexed video id rather than the raw URL."""
+    title = 'video'
+    parameter_name = 'has_video'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(youtube_video_id__gt='')
+        if self.value() == 'no':
+            return queryset.filter(youtube_video_id='')
+        return queryset
 
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     """Admin configuration for Lesson model."""
     list_display = ['title', 'course', 'order', 'has_video', 'created_at']
+    list_select_related = ['course']
     search_fields = ['title', 'course__title']
-    list_filter = ['course', 'created_at']
-    ordering = ['course', 'created_at']
+    list_filter = [HasVideoFilter, CourseIdFilter, 'created_at']
+    autocomplete_fields = ['course']
+    ordering = ['course', 'order']
+
+    def get_queryset(self, request):
+        # Lesson.__str__, shown in autocomplete results, includes the course title.
+        return super().get_queryset(request).select_related('course')
 
     def has_video(self, obj):
-        return bool(obj.youtube_url)
+        return bool(obj.youtube_video_id)
     has_video.boolean = True
     has_video.short_description = 'Video'
 
@@ -64,14 +159,26 @@ class LessonAdmin(admin.ModelAdmin):
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     """Admin configuration for Enrollment model."""
-    list_display = ['user', 'course', 'enrolled_at']
+    list_display = ['user', 'course', 'completed_lessons', 'enrolled_at']
+    list_select_related = ['user', 'course']
     search_fields = ['user__username', 'course__title']
-    list_filter = ['enrolled_at', 'course']
+    list_filter = ['enrolled_at', CourseIdFilter]
+    autocomplete_fields = ['user', 'course']
+    # Newest first by primary key, which needs no index of its own.
+    ordering = ['-pk']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(LessonProgress)
 class LessonProgressAdmin(admin.ModelAdmin):
     """Admin configuration for LessonProgress model."""
     list_display = ['user', 'lesson', 'viewed_at']
+    # Lesson.__str__ includes its course title.
+    list_select_related = ['user', 'lesson__course']
     search_fields = ['user__username', 'lesson__title']
-    list_filter = ['viewed_at', 'lesson__course']
+    list_filter = ['viewed_at', CourseIdFilter]
+    autocomplete_fields = ['user', 'lesson']
+    ordering = ['-pk']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,334 @@
+"""
+Read-only JSON API, version 1, plus a batched endpoint for lesson views.
+
+Every list is keyset-paginated (see ``courses.pagination``): ``limit``
+sets the page size and the ``next`` and ``previous`` links carry the
+cursors. ``fields=`` picks a comma-separated subset of a resource's
+fields, and only the columns behind those fields are selected. Rows come
+straight from ``.values()`` into ``JsonResponse``, with no model
+instances or templates in between. Lesson and course counts are the
+stored counters, and instructor names come from a join, so a page costs
+one query whatever it embeds.
+
+Endpoints under ``me/`` answer for the signed-in user and return 401
+otherwise. They use the session cookie, so POSTs need the CSRF token.
+Lesson outlines are public like the course pages, but a lesson's content
+and video, like the lesson page, are only for learners enrolled in its
+course.
+"""
+import json
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_http_methods
+
+from .models import Course, Enrollment, Instructor, Lesson, LessonProgress
+from .pagination import InvalidCursor, KeysetPaginator
+from .tracking import write_lesson_views
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Lesson views accepted in one POST to ``me/progress/``.
+MAX_PROGRESS_BATCH = 500
+
+
+class ApiError(Exception):
+    """Raised for a bad request; rendered as a JSON error with ``status``."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Resource:
+    """
+    How one model is exposed: ``fields`` maps each public field name to
+    the lookup it is read from, ``default`` lists the fields returned
+    when the request names none, ``ordering`` is the keyset order and
+    ``private`` names the fields only enrolled learners may read.
+    """
+
+    def __init__(self, fields, default, ordering, private=()):
+        self.fields = fields
+        self.default = default
+        self.ordering = ordering
+        self.private = frozenset(private)
+
+    def selected(self, request):
+        names = request.GET.get('fields')
+        if not names:
+            return list(self.default)
+        names = [name.strip() for name in names.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}.")
+        return list(dict.fromkeys(names))
+
+    def rows(self, queryset, names):
+        """Select ``names`` plus the ordering columns the cursors need."""
+        lookups = [self.fields[name] for name in names]
+        keys = [name.lstrip('-') for name in self.ordering]
+        return queryset.values(*dict.fromkeys(lookups + keys))
+
+    def serialize(self, row, names):
+        return {name: row[self.fields[name]] for name in names}
+
+
+COURSES = Resource(
+    fields={
+        'id': 'id',
+        'title': 'title',
+        'short_description': 'short_description',
+        'long_description': 'long_description',
+        'thumbnail_url': 'thumbnail_url',
+        'instructor': 'instructor_id',
+        'instructor_name': 'instructor__name',
+        'lesson_count': 'lesson_count',
+        'enrollment_count': 'enrollment_count',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    default=[
+        'id', 'title', 'short_description', 'thumbnail_url', 'instructor',
+        'instructor_name', 'lesson_count', 'enrollment_count', 'updated_at',
+    ],
+    ordering=Course._meta.ordering,
+)
+
+LESSONS = Resource(
+    fields={
+        'id': 'id',
+        'course': 'course_id',
+        'title': 'title',
+        'order': 'order',
+        'content': 'content',
+        'content_html': 'content_html',
+        'youtube_url': 'youtube_url',
+        'youtube_video_id': 'youtube_video_id',
+        'youtube_embed_url': 'youtube_embed_url',
+        'updated_at': 'updated_at',
+    },
+    default=['id', 'course', 'title', 'order', 'updated_at'],
+    ordering=('order', 'id'),
+    private=['content', 'content_html', 'youtube_url', 'youtube_video_id', 'youtube_embed_url'],
+)
+
+INSTRUCTORS = Resource(
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'bio': 'bio',
+        'bio_excerpt': 'bio_excerpt',
+        'profile_pic_url': 'profile_pic_url',
+        'website': 'website',
+        'course_count': 'course_count',
+    },
+    default=['id', 'name', 'profile_pic_url', 'course_count'],
+    ordering=('name', 'id'),
+)
+
+ENROLLMENTS = Resource(
+    fields={
+        'id': 'id',
+        'course': 'course_id',
+        'course_title': 'course__title',
+        'completed_lessons': 'completed_lessons',
+        'lesson_count': 'course__lesson_count',
+        'enrolled_at': 'enrolled_at',
+    },
+    default=['id', 'course', 'course_title', 'completed_lessons', 'lesson_count', 'enrolled_at'],
+    ordering=('-enrolled_at', '-id'),
+)
+
+PROGRESS = Resource(
+    fields={
+        'lesson': 'lesson_id',
+        'course': 'course_id',
+        'viewed_at': 'viewed_at',
+    },
+    default=['lesson', 'course', 'viewed_at'],
+    ordering=('-viewed_at', '-id'),
+)
+
+
+def api_view(view):
+    """Render :class:`ApiError` and ``Http404`` raised by ``view`` as JSON errors."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({'error': str(exc)}, status=exc.status)
+        except Http404:
+            return JsonResponse({'error': 'Not found.'}, status=404)
+    return wrapped
+
+
+def api_login_required(view):
+    """Like ``login_required``, but answer 401 instead of redirecting."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError('Authentication required.', status=401)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def _int_param(request, name, default=None):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'{name} must be an integer.')
+
+
+def _page_link(request, **cursor):
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params.update(cursor)
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def list_response(request, resource, queryset, names=None):
+    """Return one page of ``queryset`` as ``{results, next, previous}``."""
+    names = names or resource.selected(request)
+    limit = min(max(_int_param(request, 'limit', DEFAULT_LIMIT), 1), MAX_LIMIT)
+    paginator = KeysetPaginator(resource.rows(queryset, names), limit, resource.ordering)
+    try:
+        page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        raise ApiError('Invalid page cursor.')
+    return JsonResponse({
+        'results': [resource.serialize(row, names) for row in page],
+        'next': _page_link(request, after=page.next_cursor) if page.has_next() else None,
+        'previous': _page_link(request, before=page.previous_cursor) if page.has_previous() else None,
+    })
+
+
+def detail_response(request, resource, queryset, names=None):
+    names = names or resource.selected(request)
+    row = get_object_or_404(resource.rows(queryset, names))
+    return JsonResponse(resource.serialize(row, names))
+
+
+@require_GET
+@api_view
+def course_list(request):
+    """List courses, newest first; ``instructor=`` filters by instructor id."""
+    courses = Course.objects.all()
+    instructor = _int_param(request, 'instructor')
+    if instructor is not None:
+        courses = courses.filter(instructor_id=instructor)
+    return list_response(request, COURSES, courses)
+
+
+@require_GET
+@api_view
+def course_detail(request, pk):
+    return detail_response(request, COURSES, Course.objects.filter(pk=pk))
+
+
+def _reads_private(request, resource, names):
+    """Whether ``names`` include private fields; raise 401 for anonymous users if so."""
+    if resource.private.isdisjoint(names):
+        return False
+    if not request.user.is_authenticated:
+        raise ApiError('Authentication required.', status=401)
+    return True
+
+
+@require_GET
+@api_view
+def lesson_list(request, pk):
+    """List a course's lessons in order; content fields need an enrollment."""
+    names = LESSONS.selected(request)
+    get_object_or_404(Course.objects.only('pk'), pk=pk)
+    if _reads_private(request, LESSONS, names) and not Enrollment.objects.filter(
+        user=request.user, course_id=pk
+    ).exists():
+        raise ApiError('You must be enrolled in this course to read its lessons.', status=403)
+    return list_response(request, LESSONS, Lesson.objects.filter(course_id=pk), names)
+
+
+@require_GET
+@api_view
+def lesson_detail(request, pk):
+    """Return one lesson; content fields are found only in the user's enrolled courses."""
+    names = LESSONS.selected(request)
+    lessons = Lesson.objects.filter(pk=pk)
+    if _reads_private(request, LESSONS, names):
+        lessons = lessons.filter(course__enrollments__user=request.user)
+    return detail_response(request, LESSONS, lessons, names)
+
+
+@require_GET
+@api_view
+def instructor_list(request):
+    return list_response(request, INSTRUCTORS, Instructor.objects.all())
+
+
+@require_GET
+@api_view
+def instructor_detail(request, pk):
+    return detail_response(request, INSTRUCTORS, Instructor.objects.filter(pk=pk))
+
+
+@require_GET
+@api_view
+@api_login_required
+def my_enrollments(request):
+    """List the signed-in user's enrollments, newest first."""
+    return list_response(request, ENROLLMENTS, Enrollment.objects.filter(user=request.user))
+
+
+@require_http_methods(['GET', 'POST'])
+@api_view
+@api_login_required
+def my_progress(request):
+    """
+    GET lists the user's lesson views, newest first; ``course=`` filters
+    by course. POST records a batch of views sent as
+    ``{"lessons": [id, ...]}`` and answers with the ids ``accepted`` and
+    those ``rejected`` because the lesson does not exist or the user is
+    not enrolled in its course.
+    """
+    if request.method == 'POST':
+        return _record_progress(request)
+    progress = LessonProgress.objects.filter(user=request.user)
+    course = _int_param(request, 'course')
+    if course is not None:
+        progress = progress.filter(course_id=course)
+    return list_response(request, PROGRESS, progress)
+
+
+def _record_progress(request):
+    try:
+        lesson_ids = json.loads(request.body)['lessons']
+    except (ValueError, KeyError, TypeError):
+        raise ApiError('Expected a JSON object with a "lessons" list.')
+    if not isinstance(lesson_ids, list) or not all(
+        isinstance(pk, int) and not isinstance(pk, bool) for pk in lesson_ids
+    ):
+        raise ApiError('"lessons" must be a list of lesson ids.')
+    lesson_ids = list(dict.fromkeys(lesson_ids))
+    if len(lesson_ids) > MAX_PROGRESS_BATCH:
+        raise ApiError(f'At most {MAX_PROGRESS_BATCH} lessons per request.', status=413)
+
+    courses = dict(
+        Lesson.objects.filter(
+            pk__in=lesson_ids, course__enrollments__user=request.user
+        ).values_list('pk', 'course_id')
+    )
+    if courses:
+        write_lesson_views(
+            {(request.user.pk, lesson_id): course_id for lesson_id, course_id in courses.items()},
+            'api',
+        )
+    return JsonResponse({
+        'accepted': [pk for pk in lesson_ids if pk in courses],
+        'rejected': [pk for pk in lesson_ids if pk not in courses],
+    })
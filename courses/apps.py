@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CoursesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'courses'
+
+    def ready(self):
+        from . import routers, signals  # noqa: F401
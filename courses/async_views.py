@@ -0,0 +1,144 @@
+"""
+Async variants of the catalog and progress pages, for ASGI deployments.
+
+They render the same templates from the same queries as the views in
+``courses.views``. Queries that do not depend on each other (the
+enrollment check, the viewed lessons, the instructor's other courses, the
+lesson's neighbours) run at the same time through
+:func:`courses.concurrency.gather`; the rest use the async ORM. Work that
+mixes cache and ORM calls, and template rendering (which may evaluate
+querysets when a fragment has to be rendered again), runs in a thread.
+
+``ASYNC_VIEWS = True`` routes the pages here instead of to the sync views.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import get_object_or_404, redirect, render
+
+from .cache import attach_cache_versions
+from .concurrency import gather
+from .conditional import conditional_course_detail, conditional_course_list, conditional_lesson_detail
+from .models import Course, Enrollment, Lesson
+from .page_cache import cache_anonymous_page
+from .progress import aenrollment_progress, enrollment_progress_by_course, viewed_lesson_ids
+from .tracking import record_lesson_view
+from .views import CATALOG_PARAMS, catalog_page, other_courses_by
+
+
+async def _user(request):
+    """Return ``request.user``, loading it from the session in a thread."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def _aget_or_404(queryset, **lookups):
+    try:
+        return await queryset.aget(**lookups)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+def login_required(view):
+    """``login_required`` for async views."""
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        user = await _user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapped
+
+
+@cache_anonymous_page(params=CATALOG_PARAMS)
+@conditional_course_list
+async def course_list(request):
+    """Display available courses, one keyset-paginated page at a time."""
+    user = await _user(request)
+    page = await sync_to_async(catalog_page)(request)
+
+    enrolled_courses_data = {}
+    if user.is_authenticated and page.object_list:
+        enrolled_courses_data = await sync_to_async(enrollment_progress_by_course)(
+            user, course_ids=[course.pk for course in page]
+        )
+
+    return await sync_to_async(render)(request, 'courses/course_list.html', {
+        'courses': page.object_list,
+        'page': page,
+        'enrolled_courses_data': enrolled_courses_data,
+    })
+
+
+@cache_anonymous_page
+@conditional_course_detail
+async def course_detail(request, pk):
+    """Display course details and its lessons."""
+    user = await _user(request)
+    course = await _aget_or_404(Course.objects.select_related('instructor'), pk=pk)
+    await sync_to_async(attach_cache_versions)([course])
+
+    def is_enrolled():
+        return user.is_authenticated and Enrollment.objects.filter(user=user, course=course).exists()
+
+    def viewed():
+        # Fetched alongside the enrollment check; thrown away if not enrolled.
+        return viewed_lesson_ids(user, course) if user.is_authenticated else set()
+
+    def other_courses():
+        return other_courses_by(course) if course.instructor_id else []
+
+    enrolled, viewed_lessons, others = await gather(is_enrolled, viewed, other_courses)
+
+    return await sync_to_async(render)(request, 'courses/course_detail.html', {
+        'course': course,
+        'lessons': course.lessons.all(),
+        'is_enrolled': enrolled,
+        'viewed_lessons': viewed_lessons if enrolled else set(),
+        'other_courses': others,
+    })
+
+
+@login_required
+async def my_courses(request):
+    """Display courses the current user is enrolled in."""
+    courses_with_progress = await aenrollment_progress(request.user)
+    return await sync_to_async(render)(request, 'courses/my_courses.html', {'courses': courses_with_progress})
+
+
+@login_required
+@conditional_lesson_detail
+async def lesson_detail(request, course_pk, lesson_pk):
+    """Display lesson details and track progress."""
+    user = request.user
+    course = await _aget_or_404(Course.objects.all(), pk=course_pk)
+    await sync_to_async(attach_cache_versions)([course])
+
+    lesson, is_enrolled = await gather(
+        # The page shows the stored content_html, not the source text.
+        lambda: get_object_or_404(Lesson.objects.defer('content'), pk=lesson_pk, course=course),
+        lambda: Enrollment.objects.filter(user=user, course=course).exists(),
+    )
+    if not is_enrolled:
+        messages.warning(request, 'You must be enrolled in this course to view lessons.')
+        return redirect('course_detail', pk=course_pk)
+
+    # Written before the progress is read back, so the page includes it.
+    await sync_to_async(record_lesson_view)(user, lesson)
+    prev_lesson, next_lesson, viewed_lessons = await gather(
+        lesson.get_previous_lesson,
+        lesson.get_next_lesson,
+        lambda: viewed_lesson_ids(user, course),
+    )
+
+    return await sync_to_async(render)(request, 'courses/lesson_detail.html', {
+        'course': course,
+        'lesson': lesson,
+        'all_lessons': course.lessons.only('id', 'course', 'title', 'order'),
+        'viewed_lessons': viewed_lessons,
+        'prev_lesson': prev_lesson,
+        'next_lesson': next_lesson,
+    })
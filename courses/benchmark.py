@@ -0,0 +1,298 @@
+"""
+View benchmarks with query-count and latency budgets.
+
+Each scenario requests one page as a representative user and records the
+number of queries and SQL time with an empty cache (the worst case, where
+every cached fragment is rendered again), then the p50 and p95 wall time
+and the render time over repeated warm requests. ``check`` compares the
+results with the budgets in ``benchmark_budgets.json`` and flags any view
+whose query count grows with the size of the dataset.
+
+Run it with ``python manage.py benchmark_views``.
+
+:func:`compare_servers` measures throughput instead: it serves the same
+scenarios from gunicorn (configured by ``gunicorn.conf.py``) with threaded
+WSGI workers and with uvicorn ASGI workers (``ASYNC_VIEWS`` on) and
+drives each with concurrent keep-alive clients. Run it with
+``python manage.py benchmark_servers``.
+"""
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.template.backends.django import Template
+from django.test import Client
+from django.urls import reverse
+
+from .models import Course, Enrollment, Lesson
+
+BUDGETS_PATH = Path(__file__).with_name('benchmark_budgets.json')
+
+# generate_catalog options for each dataset size.
+SIZES = {
+    'small': {'instructors': 5, 'courses': 30, 'lessons_per_course': 5, 'users': 100, 'enrollments_per_user': 3},
+    'medium': {'instructors': 20, 'courses': 300, 'lessons_per_course': 20, 'users': 1000, 'enrollments_per_user': 5},
+    'large': {'instructors': 50, 'courses': 1500, 'lessons_per_course': 60, 'users': 3000, 'enrollments_per_user': 8},
+}
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts queries and sums their duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+@contextmanager
+def recording_renders():
+    """Collect the duration of every top-level template render in a list."""
+    durations = []
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - started)
+
+    Template.render = render
+    try:
+        yield durations
+    finally:
+        Template.render = original
+
+
+def scenarios():
+    """
+    Return ``(name, user, path)`` for every benchmarked view, using the
+    busiest learner and the most popular course so that each page shows
+    as much data as the dataset holds.
+    """
+    enrollment = Enrollment.objects.filter(
+        user__in=Enrollment.objects.values('user').annotate(
+            enrollments=Count('pk')
+        ).order_by('-enrollments').values('user')[:1]
+    ).select_related('user').order_by('-course__lesson_count', 'pk').first()
+    if enrollment is None:
+        raise ValueError('The dataset has no enrollments to benchmark.')
+    user, course = enrollment.user, Course.objects.get(pk=enrollment.course_id)
+    lessons = list(Lesson.objects.filter(course=course).values_list('pk', flat=True))
+    lesson_pk = lessons[len(lessons) // 2]
+    return [
+        ('course_list', None, reverse('course_list')),
+        ('course_list_authenticated', user, reverse('course_list')),
+        ('my_courses', user, reverse('my_courses')),
+        ('course_detail', user, reverse('course_detail', args=[course.pk])),
+        ('lesson_detail', user, reverse('lesson_detail', args=[course.pk, lesson_pk])),
+    ]
+
+
+def measure(client, path, iterations):
+    """Benchmark one page; see the module docstring for what is recorded."""
+    cache.clear()
+    recorder = QueryRecorder()
+    with connection.execute_wrapper(recorder):
+        response = client.get(path)
+    if response.status_code != 200:
+        raise AssertionError(f'{path} returned {response.status_code}')
+
+    timings = []
+    with recording_renders() as renders:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(path)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'queries': recorder.count,
+        'sql_ms': round(recorder.seconds * 1000, 2),
+        'render_ms': round(statistics.median(renders) * 1000, 2) if renders else 0.0,
+        'p50_ms': round(statistics.median(timings) * 1000, 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 2),
+    }
+
+
+def run(iterations=20):
+    """Benchmark every scenario against the current database."""
+    results = {}
+    for name, user, path in scenarios():
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        results[name] = measure(client, path, iterations)
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path) as budgets:
+        return json.load(budgets)
+
+
+def check(results, budgets):
+    """
+    Return a list of budget violations in ``results``, a mapping of
+    dataset size to :func:`run` output.
+    """
+    failures = []
+    for size, views in results.items():
+        for name, result in views.items():
+            budget = budgets.get(name, {})
+            if 'max_queries' in budget and result['queries'] > budget['max_queries']:
+                failures.append(
+                    f"{name} ({size}): {result['queries']} queries, budget {budget['max_queries']}"
+                )
+            if 'p95_ms' in budget and result['p95_ms'] > budget['p95_ms']:
+                failures.append(
+                    f"{name} ({size}): p95 {result['p95_ms']}ms, budget {budget['p95_ms']}ms"
+                )
+    sizes = list(results)
+    for name in results[sizes[0]] if sizes else ():
+        counts = [results[size][name]['queries'] for size in sizes]
+        if any(count > counts[0] for count in counts[1:]):
+            failures.append(
+                f'{name}: query count grows with data size ('
+                + ', '.join(f'{size} {count}' for size, count in zip(sizes, counts)) + ')'
+            )
+    return failures
+
+
+# Server throughput
+
+# gunicorn application, worker class and environment for each server mode.
+SERVER_MODES = {
+    'wsgi': ('mooc_catalog.wsgi:application', 'gthread', {'ASYNC_VIEWS': 'False'}),
+    'asgi': ('mooc_catalog.asgi:application', 'uvicorn_worker.UvicornWorker', {'ASYNC_VIEWS': 'True'}),
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_server(mode, workers, timeout=30):
+    """Run gunicorn in ``mode`` against the current database; yield its port."""
+    app, worker_class, env = SERVER_MODES[mode]
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', app, '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--worker-class', worker_class, '--log-level', 'warning',
+        ],
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ, 'DEBUG': 'False', 'ALLOWED_HOSTS': '127.0.0.1',
+            'GUNICORN_WORKER_CLASS': worker_class,
+            # Every request is slow under load; the log would drown the results.
+            'SLOW_REQUEST_THRESHOLD_MS': '600000', **env,
+        },
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'The {mode} server exited with status {process.returncode}.')
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'The {mode} server did not start within {timeout}s.')
+                time.sleep(0.2)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=timeout)
+
+
+def drive_load(port, requests, concurrency, duration):
+    """
+    Send ``requests`` (``(path, headers)`` pairs, in rotation) from
+    ``concurrency`` keep-alive clients for ``duration`` seconds.
+    """
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies, errors = [], 0
+        index = offset
+        while time.monotonic() < deadline:
+            path, headers = requests[index % len(requests)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        connection.close()
+        return latencies, errors
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(client, range(concurrency)))
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    if not latencies:
+        raise RuntimeError('No request succeeded.')
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+    }
+
+
+def server_requests():
+    """Return ``(path, headers)`` for every scenario, logged in as its user."""
+    requests = []
+    for _, user, path in scenarios():
+        headers = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        requests.append((path, headers))
+    return requests
+
+
+def compare_servers(modes=tuple(SERVER_MODES), workers=2, concurrency=32, duration=10):
+    """Return :func:`drive_load` results for each server mode."""
+    requests = server_requests()
+    results = {}
+    for mode in modes:
+        with running_server(mode, workers) as port:
+            # One pass to warm the workers' caches and connections.
+            drive_load(port, requests, min(concurrency, workers * 2), 1)
+            results[mode] = drive_load(port, requests, concurrency, duration)
+    return results
@@ -0,0 +1,150 @@
+"""
+Version numbers for cached fragments.
+
+Every course and instructor has a version number in the cache. Fragment
+keys include the versions of the objects they render, and the signal
+handlers in ``courses.signals`` bump a version whenever its object (or,
+for courses, one of its lessons) changes. Stale fragments are therefore
+never looked up again and simply age out; nothing has to scan or delete
+cache entries.
+
+A version that is missing from the cache (never set, or evicted) is
+recreated from the clock rather than from 1, so an eviction can never
+bring an old version number, and the fragments cached under it, back.
+
+While :func:`recording_versions` is active, every version read is noted,
+so a whole page can be cached along with the versions it was rendered
+from and checked with :func:`versions_current` before it is reused.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+COURSE = 'course'
+INSTRUCTOR = 'instructor'
+# Catalog-wide versions: MEMBERS changes when a course is added, removed or
+# moves to another instructor, CONTENTS whenever anything the catalog shows does.
+CATALOG = 'catalog'
+CATALOG_MEMBERS = 'members'
+CATALOG_CONTENTS = 'contents'
+# Per-user version of their enrollments and lesson progress.
+PROGRESS = 'progress'
+
+_recorded_versions = contextvars.ContextVar('recorded_versions', default=None)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _version_key(kind, pk):
+    return f'version:{kind}:{pk}'
+
+
+def _fresh_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(kind, ids):
+    """Return ``{pk: version}`` for the given ids in a single cache round trip."""
+    keys = {_version_key(kind, pk): pk for pk in ids if pk is not None}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, pk in keys.items():
+        if key not in found:
+            version = _fresh_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            versions[pk] = version
+    recorded = _recorded_versions.get()
+    if recorded is not None:
+        recorded.update({(kind, pk): version for pk, version in versions.items()})
+    return versions
+
+
+def catalog_version(part=CATALOG_MEMBERS):
+    return get_versions(CATALOG, [part])[part]
+
+
+def progress_version(user_id):
+    return get_versions(PROGRESS, [user_id])[user_id]
+
+
+@contextmanager
+def recording_versions():
+    """Collect ``{(kind, pk): version}`` for every version read inside the block."""
+    recorded = {}
+    token = _recorded_versions.set(recorded)
+    try:
+        yield recorded
+    finally:
+        _recorded_versions.reset(token)
+
+
+def versions_current(recorded):
+    """Return whether every recorded version is still current, in one round trip."""
+    keys = {_version_key(kind, pk): version for (kind, pk), version in recorded.items()}
+    return cache.get_many(keys) == keys
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def bump_version(kind, pk):
+    """
+    Invalidate every fragment rendered from this object.
+
+    The version is bumped straight away and again once the surrounding
+    transaction commits, so a request that read the new version before
+    the commit and cached the old data under it can't keep serving it.
+    """
+    if pk is None:
+        return
+    key = _version_key(kind, pk)
+    _incr_version(key)
+    transaction.on_commit(lambda: _incr_version(key))
+
+
+def attach_cache_versions(courses):
+    """
+    Set ``cache_version`` on each course, combining its own version with
+    its instructor's, for use as a fragment cache key.
+    """
+    courses = list(courses)
+    course_versions = get_versions(COURSE, [course.pk for course in courses])
+    instructor_versions = get_versions(INSTRUCTOR, {course.instructor_id for course in courses})
+    for course in courses:
+        course.cache_version = '%s.%s' % (
+            course_versions[course.pk],
+            instructor_versions.get(course.instructor_id, 0),
+        )
+    return courses
+
+
+def fragment_timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def record_fragment_lookup(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+    metrics.record_fragment_lookup(hit)
+
+
+def fragment_stats():
+    """Return this process's fragment cache hit and miss counts."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,45 @@
+"""
+Running independent queries of an async view at the same time.
+
+Django's async ORM (``aget``, ``aexists``, ...) runs every query of a
+request on the same thread, one after another, so awaiting several of
+them with ``asyncio.gather`` does not overlap them. :func:`gather` takes
+plain sync callables instead and runs each on a worker thread with its
+own database connection, so the queries really do run concurrently.
+
+Worker threads keep their connections for ``CONN_MAX_AGE`` like request
+threads do, so each worker process holds up to one connection per thread
+of the event loop's default executor. Inside a transaction, other
+connections cannot see its uncommitted rows, so there (and with
+``ASYNC_CONCURRENT_QUERIES`` off) the callables run one after another on
+the request's own connection instead.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def _on_own_connection(call):
+    def run():
+        try:
+            return call()
+        finally:
+            # Closes the worker's connection only once it has expired or failed.
+            close_old_connections()
+    return run
+
+
+async def gather(*calls):
+    """Run sync callables concurrently and return their results in order."""
+    concurrent = getattr(settings, 'ASYNC_CONCURRENT_QUERIES', True)
+    if not concurrent or len(calls) < 2 or await sync_to_async(_in_transaction)():
+        return [await sync_to_async(call)() for call in calls]
+    return await asyncio.gather(*(
+        sync_to_async(_on_own_connection(call), thread_sensitive=False)() for call in calls
+    ))
@@ -0,0 +1,145 @@
+"""
+Validators for conditional GET.
+
+Each page gets an ETag built from everything it renders, worked out
+before the view runs: ``updated_at`` timestamps and counts read in one
+small query, and the cached versions of its instructor, the catalog and
+the visitor's own progress. Clients that send the ETag back get
+``304 Not Modified`` without the view running.
+
+The pages send no Last-Modified: instructor edits, removed lessons and
+the visitor's progress change a page without changing any
+``updated_at``, so a client revalidating with ``If-Modified-Since`` alone
+would be told a stale page is current.
+
+:func:`conditional` applies the validators to sync views with Django's
+``condition`` decorator, and to async views by working them out in a
+thread.
+"""
+import asyncio
+from datetime import timezone as dt_timezone
+from functools import wraps
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .cache import (
+    CATALOG_CONTENTS, CATALOG_MEMBERS, INSTRUCTOR, catalog_version, get_versions, progress_version,
+)
+from .models import Course, Lesson
+
+
+def _viewer(request):
+    """
+    Return what a page shows that depends on the visitor, or None when
+    the response must be rendered regardless (pending messages).
+    """
+    if len(messages.get_messages(request)):
+        return None
+    if not request.user.is_authenticated:
+        return ('anonymous',)
+    # A new CSRF secret (after logging in again) has to reach the forms.
+    return (
+        request.user.pk,
+        progress_version(request.user.pk),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    )
+
+
+def _etag(*parts):
+    return sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def _course_state(request, course_pk, lesson_pk=None):
+    """Return the row the validators are built from, fetched once per request."""
+    if getattr(request, '_course_state', None) is None:
+        siblings = Course.objects.filter(instructor=OuterRef('instructor_id')).order_by().values('instructor')
+        rows = Course.objects.filter(pk=course_pk).values(
+            'updated_at', 'lesson_count', 'instructor_id'
+        ).annotate(
+            lessons_updated=Max('lessons__updated_at'),
+            siblings_updated=Subquery(siblings.annotate(last=Max('updated_at')).values('last')),
+            sibling_lessons=Subquery(siblings.annotate(total=Sum('lesson_count')).values('total')),
+            lesson_updated=Subquery(
+                Lesson.objects.filter(pk=lesson_pk, course=OuterRef('pk')).values('updated_at')
+            ),
+        ).order_by()[:1]
+        request._course_state = rows[0] if rows else {}
+    return request._course_state
+
+
+def _course_parts(request, course_pk, lesson_pk=None):
+    state = _course_state(request, course_pk, lesson_pk)
+    if not state:
+        return None
+    # The instructor's version also changes when their list of courses does.
+    instructor_id = state['instructor_id']
+    return tuple(sorted(state.items())) + (get_versions(INSTRUCTOR, [instructor_id]).get(instructor_id),)
+
+
+def course_detail_etag(request, pk):
+    course, viewer = _course_parts(request, pk), _viewer(request)
+    if course is None or viewer is None:
+        return None
+    return _etag('course', pk, course, viewer)
+
+
+def lesson_detail_etag(request, course_pk, lesson_pk):
+    course, viewer = _course_parts(request, course_pk, lesson_pk), _viewer(request)
+    if course is None or viewer is None or _course_state(request, course_pk)['lesson_updated'] is None:
+        return None
+    return _etag('lesson', lesson_pk, course, viewer)
+
+
+def course_list_etag(request):
+    viewer = _viewer(request)
+    if viewer is None:
+        return None
+    return _etag(
+        'catalog', request.GET.urlencode(),
+        catalog_version(CATALOG_MEMBERS), catalog_version(CATALOG_CONTENTS), viewer,
+    )
+
+
+def conditional(etag_func, last_modified_func=None):
+    """``condition(etag_func, last_modified_func)`` for sync and async views."""
+    def validators(request, args, kwargs):
+        etag = etag_func(request, *args, **kwargs)
+        last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+        if last_modified and timezone.is_naive(last_modified):
+            last_modified = timezone.make_aware(last_modified, dt_timezone.utc)
+        return (
+            quote_etag(etag) if etag is not None else None,
+            int(last_modified.timestamp()) if last_modified else None,
+        )
+
+    def decorator(view):
+        if not asyncio.iscoroutinefunction(view):
+            return condition(etag_func, last_modified_func)(view)
+
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            etag, last_modified = await sync_to_async(validators)(request, args, kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return wrapped
+    return decorator
+
+
+conditional_course_detail = conditional(course_detail_etag)
+conditional_lesson_detail = conditional(lesson_detail_etag)
+conditional_course_list = conditional(course_list_etag)
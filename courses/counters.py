@@ -0,0 +1,100 @@
+"""
+Denormalized counters and the queries that recompute them.
+
+The stored counters are kept current by the signal handlers in
+``courses.signals``. Anything that bypasses model signals (``bulk_create``,
+``QuerySet.update``, raw SQL) must call one of the ``refresh_*`` helpers
+below, and ``manage.py reconcile_counters`` repairs any drift that slips
+through.
+"""
+from django.db import transaction
+from django.db.models import F, Func, OuterRef, Subquery
+
+from .models import Course, Enrollment, Instructor, Lesson, LessonProgress
+
+
+def count_subquery(queryset):
+    """Return an expression counting the rows of a correlated ``queryset``."""
+    return Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count')
+    )
+
+
+def lesson_count_expression():
+    return count_subquery(Lesson.objects.filter(course=OuterRef('pk')))
+
+
+def enrollment_count_expression():
+    return count_subquery(Enrollment.objects.filter(course=OuterRef('pk')))
+
+
+def course_count_expression():
+    return count_subquery(Course.objects.filter(instructor=OuterRef('pk')))
+
+
+def completed_lessons_expression():
+    return count_subquery(
+        LessonProgress.objects.filter(
+            user=OuterRef('user_id'),
+            course=OuterRef('course_id')
+        )
+    )
+
+
+# (model, counter field, expression factory) for every stored counter.
+COUNTERS = [
+    (Course, 'lesson_count', lesson_count_expression),
+    (Course, 'enrollment_count', enrollment_count_expression),
+    (Instructor, 'course_count', course_count_expression),
+    (Enrollment, 'completed_lessons', completed_lessons_expression),
+]
+
+
+def refresh_course_counters(course_ids):
+    """Recompute the lesson and enrollment counts of the given courses."""
+    return Course.objects.filter(pk__in=course_ids).update(
+        lesson_count=lesson_count_expression(),
+        enrollment_count=enrollment_count_expression(),
+    )
+
+
+def refresh_instructor_counters(instructor_ids):
+    """Recompute the course counts of the given instructors."""
+    return Instructor.objects.filter(pk__in=instructor_ids).update(
+        course_count=course_count_expression(),
+    )
+
+
+def refresh_completed_lessons(enrollments):
+    """Recompute ``completed_lessons`` for an Enrollment queryset."""
+    return enrollments.update(completed_lessons=completed_lessons_expression())
+
+
+def reconcile(model, field, expression, batch_size=1000, start_pk=None):
+    """
+    Repair drift in ``model.field`` by primary key ranges of ``batch_size``.
+
+    Each batch runs in its own short transaction, so large tables are never
+    locked for long. Yields ``(last_pk, repaired)`` after every batch;
+    passing the last reported pk back as ``start_pk`` resumes the run.
+    """
+    queryset = model._default_manager.order_by('pk')
+    last_pk = start_pk
+    while True:
+        batch = queryset
+        if last_pk is not None:
+            batch = queryset.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            drifted = list(
+                model._default_manager.filter(pk__in=pks)
+                .annotate(actual=expression())
+                .exclude(**{field: F('actual')})
+                .values_list('pk', flat=True)
+            )
+            if drifted:
+                model._default_manager.filter(pk__in=drifted).update(**{field: expression()})
+        last_pk = pks[-1]
+        yield last_pk, len(drifted)
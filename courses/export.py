@@ -0,0 +1,158 @@
+"""
+Streaming exports of enrollments and lesson progress as CSV or NDJSON.
+
+Rows are read in primary key order, in windows of ``chunk_size * 10``
+rows, each fetched with ``QuerySet.iterator(chunk_size=...)``. Only one
+window is ever held, whether or not the database driver can use
+server-side cursors, so memory stays flat however large the export is.
+Every row starts with its ``id``; passing the last id written back as
+``after`` resumes an interrupted export from the next row.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Enrollment, LessonProgress
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class ExportError(ValueError):
+    """Raised for export options that cannot be applied."""
+
+
+class Export:
+    """
+    An exportable model: ``columns`` maps each output column to the lookup
+    it is read from, the first being the id, and ``date_field`` is the
+    timestamp the date range applies to.
+    """
+
+    def __init__(self, model, columns, date_field):
+        self.model = model
+        self.columns = columns
+        self.date_field = date_field
+
+
+EXPORTS = {
+    'enrollments': Export(
+        Enrollment,
+        {
+            'id': 'id', 'user': 'user_id', 'username': 'user__username', 'course': 'course_id',
+            'completed_lessons': 'completed_lessons', 'enrolled_at': 'enrolled_at',
+        },
+        'enrolled_at',
+    ),
+    'progress': Export(
+        LessonProgress,
+        {'id': 'id', 'user': 'user_id', 'lesson': 'lesson_id', 'course': 'course_id', 'viewed_at': 'viewed_at'},
+        'viewed_at',
+    ),
+}
+
+
+def parse_moment(value, end=False):
+    """
+    Return an aware datetime for an ISO date or datetime string. A bare
+    date means its start, or with ``end`` the start of the next day.
+    """
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day, time.min)
+        if end:
+            moment += timedelta(days=1)
+    elif moment is None:
+        raise ExportError(f'Invalid date: {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def filtered(export, courses=None, since=None, until=None):
+    """
+    Return ``export``'s rows for ``courses`` (ids) with the timestamp in
+    ``[since, until)``.
+    """
+    queryset = export.model.objects.order_by()
+    if courses:
+        queryset = queryset.filter(course_id__in=courses)
+    if since:
+        queryset = queryset.filter(**{f'{export.date_field}__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{export.date_field}__lt': until})
+    return queryset
+
+
+def rows(export, queryset, after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield tuples of ``export.columns`` from ``queryset``, by id, after id ``after``."""
+    queryset = queryset.values_list(*export.columns.values()).order_by('pk')
+    last = after
+    window = chunk_size * 10
+    while True:
+        batch = queryset if last is None else queryset.filter(pk__gt=last)
+        count = 0
+        for row in batch[:window].iterator(chunk_size=chunk_size):
+            count += 1
+            last = row[0]
+            yield row
+        if count < window:
+            return
+
+
+class _Echo:
+    """A file-like object whose ``write`` returns what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def csv_lines(export, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(list(export.columns))
+    for row in rows:
+        yield writer.writerow([_value(value) for value in row])
+
+
+def ndjson_lines(export, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(export.columns, map(_value, row)))) + '\n'
+
+
+WRITERS = {'csv': csv_lines, 'ndjson': ndjson_lines}
+
+
+def stream(name, fmt, courses=None, since=None, until=None, after=None,
+           chunk_size=DEFAULT_CHUNK_SIZE, on_row=None):
+    """
+    Return an iterator of text lines for the ``name`` export in ``fmt``.
+    ``on_row`` is called with each row as it is written.
+    """
+    if name not in EXPORTS:
+        raise ExportError(f'Unknown export: {name!r}')
+    if fmt not in WRITERS:
+        raise ExportError(f'Unknown format: {fmt!r}')
+    export = EXPORTS[name]
+    queryset = filtered(export, courses, parse_moment(since), parse_moment(until, end=True))
+    selected = rows(export, queryset, after, chunk_size)
+    if on_row is not None:
+        selected = _observed(selected, on_row)
+    return WRITERS[fmt](export, selected)
+
+
+def _observed(rows, on_row):
+    for row in rows:
+        on_row(row)
+        yield row
@@ -0,0 +1,359 @@
+"""
+Bulk import of instructors, courses and lessons.
+
+Bundles are streamed record by record from NDJSON (one JSON object per
+line) or CSV (one record per row), each record tagged with a ``type`` of
+``instructor``, ``course`` or ``lesson`` and keyed by a stable
+``external_id``. Courses name their instructor and lessons their course by
+external id, and a course record may carry its lessons inline in a
+``lessons`` list. A lesson without an ``order`` goes after the lessons
+before it in the bundle, or after the course's existing lessons if it is
+the first in the bundle. A lesson whose position is already taken by an
+earlier lesson in the same batch is rejected.
+
+Records are upserted in batches with ``bulk_create(update_conflicts=True)``
+on ``external_id``, so importing the same bundle twice creates no
+duplicates and importing a new revision updates rows in place. Each batch runs in its
+own transaction and does the bookkeeping that ``save()`` and the signal
+handlers would otherwise do: derived fields, counters, the search index
+and the fragment cache versions. Referenced instructors and courses are
+always written before the batch that references them.
+
+Records that cannot be imported (missing fields, unknown references) are
+skipped and reported; the rest of the bundle is still imported.
+"""
+import csv
+import json
+import time
+
+from django.db import transaction
+from django.db.models import F, Max
+
+from . import search
+from .cache import CATALOG, CATALOG_CONTENTS, CATALOG_MEMBERS, COURSE, INSTRUCTOR, bump_version
+from .counters import refresh_completed_lessons, refresh_course_counters, refresh_instructor_counters
+from .models import Course, Enrollment, Instructor, Lesson, LessonProgress
+from .rendering import bio_excerpt, content_html
+from .video import video_columns
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+
+# Fields read from each record type; the first ones listed are required.
+FIELDS = {
+    'instructor': (['external_id', 'name'], ['bio', 'profile_pic_url', 'website']),
+    'course': (
+        ['external_id', 'title'],
+        ['short_description', 'long_description', 'thumbnail_url', 'instructor'],
+    ),
+    'lesson': (['external_id', 'course', 'title'], ['content', 'youtube_url', 'order']),
+}
+
+
+class RecordError(ValueError):
+    """Raised for a record that cannot be imported."""
+
+
+def read_ndjson(lines):
+    """Yield ``(line number, record)`` from lines of JSON objects."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, RecordError(f'invalid JSON: {exc}')
+            continue
+        yield number, record
+
+
+def read_csv(lines):
+    """Yield ``(line number, record)`` from CSV rows; empty cells are omitted."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def _clean(record):
+    """Return ``(type, fields)`` for a raw record, or raise RecordError."""
+    if not isinstance(record, dict):
+        raise RecordError('expected an object')
+    kind = record.get('type')
+    if kind not in FIELDS:
+        raise RecordError(f'unknown type {kind!r}')
+    required, optional = FIELDS[kind]
+    missing = [name for name in required if record.get(name) in (None, '')]
+    if missing:
+        raise RecordError(f"{kind} is missing {', '.join(missing)}")
+    fields = {name: record[name] for name in required + optional if record.get(name) is not None}
+    fields['external_id'] = str(fields['external_id'])
+    for reference in ('instructor', 'course'):
+        if reference in fields and kind != reference:
+            fields[reference] = str(fields[reference])
+    if 'order' in fields:
+        try:
+            fields['order'] = int(fields['order'])
+        except (TypeError, ValueError):
+            raise RecordError(f"order must be an integer, not {fields['order']!r}")
+        if fields['order'] < 0:
+            raise RecordError('order must not be negative')
+    return kind, fields
+
+
+def _without(fields, name):
+    return {key: value for key, value in fields.items() if key != name}
+
+
+class ImportStats:
+    """Counts of rows imported and rejected, and the time taken."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.imported = {kind: 0 for kind in FIELDS}
+        self.rejected = 0
+        self.errors = []
+
+    @property
+    def rows(self):
+        return sum(self.imported.values())
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'line {line}: {error}')
+
+
+class Importer:
+    """
+    Buffer records and write them in batches of ``batch_size``.
+    ``on_batch(kind, count, stats)`` is called after each batch commits.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.stats = ImportStats()
+        self.pending = {kind: {} for kind in FIELDS}
+        # Next free position per course pk, for lessons without an order.
+        self.next_order = {}
+
+    def run(self, records):
+        """Import ``(line, record)`` pairs and return the :class:`ImportStats`."""
+        for line, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                self.add(line, record)
+            except RecordError as exc:
+                self.stats.reject(line, exc)
+        self.flush('lesson')
+        return self.stats
+
+    def add(self, line, record):
+        lessons = record.pop('lessons', None) if isinstance(record, dict) else None
+        kind, fields = _clean(record)
+        if lessons is not None and kind != 'course':
+            raise RecordError('only courses can list lessons')
+        # A later record for the same row replaces the earlier one.
+        self.pending[kind][fields['external_id']] = (line, fields)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+        for lesson in lessons or []:
+            try:
+                if not isinstance(lesson, dict):
+                    raise RecordError('expected an object')
+                self.add(line, {**lesson, 'type': 'lesson', 'course': fields['external_id']})
+            except RecordError as exc:
+                self.stats.reject(line, exc)
+
+    def flush(self, kind):
+        """Write pending ``kind`` records, and first everything they may reference."""
+        if kind == 'course':
+            self.flush('instructor')
+        elif kind == 'lesson':
+            self.flush('course')
+        batch, self.pending[kind] = self.pending[kind], {}
+        if not batch:
+            return
+        with transaction.atomic():
+            written = getattr(self, f'_write_{kind}s')(batch)
+        self.stats.imported[kind] += written
+        if self.on_batch:
+            self.on_batch(kind, written, self.stats)
+
+    def _resolve(self, model, batch, reference):
+        """Replace ``reference`` external ids with pks, rejecting unknown ones."""
+        ids = {fields[reference] for _, fields in batch.values() if reference in fields}
+        pks = dict(model.objects.filter(external_id__in=ids).values_list('external_id', 'pk'))
+        resolved = {}
+        for external_id, (line, fields) in batch.items():
+            if reference in fields:
+                if fields[reference] not in pks:
+                    self.stats.reject(line, f'unknown {reference} {fields[reference]!r}')
+                    continue
+                fields = {**fields, reference: pks[fields[reference]]}
+            resolved[external_id] = fields
+        return resolved
+
+    def _upsert(self, model, rows, update_fields):
+        model.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['external_id'], update_fields=update_fields,
+        )
+        # Upserts do not report primary keys on every database.
+        return dict(
+            model.objects.filter(external_id__in=[row.external_id for row in rows])
+            .values_list('external_id', 'pk')
+        )
+
+    def _write_instructors(self, batch):
+        existing = set(
+            Instructor.objects.filter(external_id__in=batch).values_list('pk', flat=True)
+        )
+        rows = [
+            Instructor(bio_excerpt=bio_excerpt(fields.get('bio', '')), **{'bio': '', **fields})
+            for _, fields in batch.values()
+        ]
+        pks = self._upsert(
+            Instructor, rows, ['name', 'bio', 'bio_excerpt', 'profile_pic_url', 'website'],
+        )
+        # Course documents include the instructor's name.
+        search.index_courses(
+            Course.objects.filter(instructor_id__in=existing).values_list('pk', flat=True)
+        )
+        for pk in pks.values():
+            bump_version(INSTRUCTOR, pk)
+        bump_version(CATALOG, CATALOG_CONTENTS)
+        return len(rows)
+
+    def _write_courses(self, batch):
+        batch = self._resolve(Instructor, batch, 'instructor')
+        if not batch:
+            return 0
+        previous = dict(
+            Course.objects.filter(external_id__in=batch).values_list('external_id', 'instructor_id')
+        )
+        rows = [
+            Course(
+                **{'short_description': '', 'long_description': '', **_without(fields, 'instructor')},
+                instructor_id=fields.get('instructor'),
+            )
+            for fields in batch.values()
+        ]
+        pks = self._upsert(Course, rows, [
+            'title', 'short_description', 'long_description', 'thumbnail_url', 'instructor', 'updated_at',
+        ])
+        instructors = {row.instructor_id for row in rows} | set(previous.values())
+        instructors.discard(None)
+        refresh_instructor_counters(instructors)
+        search.index_courses(pks.values())
+        for pk in pks.values():
+            bump_version(COURSE, pk)
+        for pk in instructors:
+            bump_version(INSTRUCTOR, pk)
+        if len(previous) < len(rows) or any(
+            previous[row.external_id] != row.instructor_id for row in rows if row.external_id in previous
+        ):
+            bump_version(CATALOG, CATALOG_MEMBERS)
+        bump_version(CATALOG, CATALOG_CONTENTS)
+        return len(rows)
+
+    def _write_lessons(self, batch):
+        batch = self._place(batch, self._resolve(Course, batch, 'course'))
+        if not batch:
+            return 0
+        previous = {
+            external_id: (pk, course_id)
+            for external_id, pk, course_id in Lesson.objects.filter(
+                external_id__in=batch
+            ).values_list('external_id', 'pk', 'course_id')
+        }
+        rows = [
+            Lesson(
+                **{'content': '', **_without(fields, 'course')},
+                content_html=content_html(fields.get('content', '')),
+                **video_columns(fields.get('youtube_url')),
+                course_id=fields['course'],
+            )
+            for fields in batch.values()
+        ]
+        courses = {row.course_id for row in rows}
+        self._vacate_positions(rows, courses)
+        pks = self._upsert(Lesson, rows, [
+            'course', 'title', 'content', 'content_html', 'youtube_url', 'youtube_video_id',
+            'youtube_embed_url', 'order', 'updated_at',
+        ])
+
+        moved = {}
+        for row in rows:
+            pk, course_id = previous.get(row.external_id, (None, None))
+            if pk is not None and course_id != row.course_id:
+                moved[pk] = row.course_id
+        if moved:
+            # Progress rows carry a copy of the lesson's course.
+            for course_id in set(moved.values()):
+                LessonProgress.objects.filter(
+                    lesson_id__in=[pk for pk, moved_to in moved.items() if moved_to == course_id]
+                ).update(course_id=course_id)
+            courses |= {course_id for _, course_id in previous.values()}
+            refresh_completed_lessons(Enrollment.objects.filter(course_id__in=courses))
+        refresh_course_counters(courses)
+        search.index_lessons(pks.values())
+        for pk in courses:
+            bump_version(COURSE, pk)
+        bump_version(CATALOG, CATALOG_CONTENTS)
+        return len(rows)
+
+    def _place(self, raw, batch):
+        """
+        Give lessons without an order the next free position in their course,
+        and reject lessons that take the same position as an earlier lesson
+        in the batch. Positions for courses new to this import start after
+        their existing lessons, read with one aggregate query.
+        """
+        unseen = {fields['course'] for fields in batch.values()} - self.next_order.keys()
+        if unseen:
+            tops = dict(
+                Lesson.objects.filter(course_id__in=unseen).exclude(external_id__in=batch)
+                .values('course_id').annotate(top=Max('order')).values_list('course_id', 'top')
+            )
+            for course_id in unseen:
+                self.next_order[course_id] = tops[course_id] + 1 if course_id in tops else 0
+        taken = set()
+        placed = {}
+        for external_id, fields in batch.items():
+            order = fields.get('order', self.next_order[fields['course']])
+            if (fields['course'], order) in taken:
+                line, raw_fields = raw[external_id]
+                self.stats.reject(
+                    line, f"another lesson in course {raw_fields['course']!r} already has order {order}"
+                )
+                continue
+            taken.add((fields['course'], order))
+            self.next_order[fields['course']] = order + 1
+            placed[external_id] = {**fields, 'order': order}
+        return placed
+
+    def _vacate_positions(self, rows, courses):
+        """
+        Move existing lessons out of the ``(course, order)`` positions the
+        batch is about to take, beyond every current position, so the
+        upsert never collides with the unique constraint. Lessons the batch
+        does not touch keep their relative order, after the imported ones.
+        """
+        targets = {(row.course_id, row.order) for row in rows}
+        occupied = [
+            pk for pk, course_id, order in Lesson.objects.filter(
+                course_id__in=courses, order__in={order for _, order in targets}
+            ).values_list('pk', 'course_id', 'order')
+            if (course_id, order) in targets
+        ]
+        if not occupied:
+            return
+        top = Lesson.objects.filter(course_id__in=courses).aggregate(top=Max('order'))['top'] or 0
+        offset = max(top, *(order for _, order in targets)) + 1
+        Lesson.objects.filter(pk__in=occupied).update(order=F('order') + offset)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Lesson
+from courses.video import backfill_video_columns
+
+
+class Command(BaseCommand):
+    help = "Re-parse every lesson's YouTube URL into its stored video id and embed URL."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Lessons checked per transaction (default: 1000).'
+        )
+        parser.add_argument(
+            '--start-pk', type=int,
+            help='Resume from this primary key (as reported by a previous run).'
+        )
+
+    def handle(self, *args, batch_size, start_pk, **options):
+        checked_to = start_pk
+        updated = 0
+        for last_pk, changed in backfill_video_columns(Lesson, batch_size, start_pk):
+            checked_to = last_pk
+            updated += changed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Checked up to pk {last_pk}, {updated} updated')
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} lesson(s) updated (checked up to pk {checked_to})'
+        ))
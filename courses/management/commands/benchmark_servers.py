@@ -0,0 +1,53 @@
+import json
+from datetime import datetime, timezone
+from importlib.util import find_spec
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from courses import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of gunicorn with threaded WSGI workers and with uvicorn '
+        'ASGI workers under concurrent load, against the current database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', choices=list(benchmark.SERVER_MODES), default=list(benchmark.SERVER_MODES),
+            help='Server modes to run (default: all).'
+        )
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server (default: 2).')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients (default: 32).')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per mode (default: 10).')
+        parser.add_argument(
+            '--output', default='server-benchmark-results.json',
+            help='Where to write the results (default: server-benchmark-results.json).'
+        )
+
+    def handle(self, *args, modes, workers, concurrency, duration, output, **options):
+        for module in ('gunicorn', 'uvicorn_worker') if 'asgi' in modes else ('gunicorn',):
+            if find_spec(module) is None:
+                raise CommandError(f'{module} is not installed (pip install -r requirements.txt).')
+        try:
+            results = benchmark.compare_servers(modes, workers, concurrency, duration)
+        except (ValueError, RuntimeError) as exc:
+            raise CommandError(str(exc))
+
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<5} {result['rps']:>8.1f} req/s {result['requests']:>7} ok {result['errors']:>5} errors "
+                f"p50 {result['p50_ms']:>8.2f}ms p95 {result['p95_ms']:>8.2f}ms"
+            )
+        with open(output, 'w') as out:
+            json.dump({
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'workers': workers,
+                'concurrency': concurrency,
+                'duration': duration,
+                'results': results,
+            }, out, indent=2)
+        self.stdout.write(f'Results written to {output}')
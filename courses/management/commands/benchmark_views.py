@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from courses import benchmark
+from mooc_catalog.test_runner import local_caches
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the catalog views against generated datasets in a throwaway '
+        'test database and fail if any view exceeds its budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', choices=list(benchmark.SIZES), default=list(benchmark.SIZES),
+            help='Dataset sizes to run, smallest first (default: all).'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Warm requests per view for the latency percentiles (default: 20).'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Dataset seed (default: 42).')
+        parser.add_argument(
+            '--budgets', default=str(benchmark.BUDGETS_PATH),
+            help='JSON file of per-view budgets (default: courses/benchmark_budgets.json).'
+        )
+        parser.add_argument(
+            '--output', default='benchmark-results.json',
+            help='Where to write the results (default: benchmark-results.json).'
+        )
+
+    def handle(self, *args, sizes, iterations, seed, budgets, output, **options):
+        budgets = benchmark.load_budgets(budgets)
+        results = {}
+        setup_test_environment()
+        # Keep the throwaway data out of the shared caches a server may be using.
+        caches = local_caches()
+        caches.enable()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            for size in sizes:
+                call_command('flush', interactive=False, verbosity=0)
+                call_command(
+                    'generate_catalog', seed=seed, skip_search_index=True,
+                    stdout=StringIO(), **benchmark.SIZES[size]
+                )
+                results[size] = benchmark.run(iterations)
+                for name, result in results[size].items():
+                    self.stdout.write(
+                        f"{size:<7} {name:<26} {result['queries']:>3} queries "
+                        f"{result['sql_ms']:>8.2f}ms SQL {result['render_ms']:>8.2f}ms render "
+                        f"p50 {result['p50_ms']:>8.2f}ms p95 {result['p95_ms']:>8.2f}ms"
+                    )
+            vendor = connection.vendor
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            caches.disable()
+            teardown_test_environment()
+
+        failures = benchmark.check(results, budgets)
+        with open(output, 'w') as out:
+            json.dump({
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'database': vendor,
+                'seed': seed,
+                'iterations': iterations,
+                'results': results,
+                'failures': failures,
+            }, out, indent=2)
+        self.stdout.write(f'Results written to {output}')
+        if failures:
+            raise CommandError('Benchmark budgets exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All views within budget'))
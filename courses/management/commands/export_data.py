@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream enrollments or lesson progress as CSV or NDJSON, in id order. '
+        'Rerun with --after set to the last id written to resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(export.EXPORTS))
+        parser.add_argument('--format', choices=list(export.WRITERS), default='csv', dest='fmt')
+        parser.add_argument(
+            '--course', type=int, action='append',
+            help='Only rows for this course id; may be given more than once.'
+        )
+        parser.add_argument('--since', help='Only rows on or after this ISO date or datetime.')
+        parser.add_argument('--until', help='Only rows before this ISO datetime, or up to the end of this date.')
+        parser.add_argument('--after', type=int, help='Resume after this id.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE,
+            help=f'Rows fetched from the database at a time (default: {export.DEFAULT_CHUNK_SIZE}).'
+        )
+        parser.add_argument('--output', help='File to write to (default: standard output).')
+
+    def handle(self, *args, dataset, fmt, course, since, until, after, chunk_size, output, **options):
+        progress = {'rows': 0, 'last': after}
+
+        def written(row):
+            progress['rows'] += 1
+            progress['last'] = row[0]
+
+        try:
+            lines = export.stream(
+                dataset, fmt, courses=course, since=since, until=until, after=after,
+                chunk_size=chunk_size, on_row=written,
+            )
+        except export.ExportError as exc:
+            raise CommandError(exc)
+
+        out = open(output, 'w', newline='') if output else self.stdout
+        try:
+            for line in lines:
+                out.write(line)
+        except KeyboardInterrupt:
+            raise CommandError(
+                f"Interrupted after {progress['rows']} row(s); resume with --after {progress['last']}"
+            )
+        finally:
+            if output:
+                out.close()
+        self.stderr.write(f"Exported {progress['rows']} row(s), last id {progress['last']}")
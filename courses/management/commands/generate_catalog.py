@@ -0,0 +1,220 @@
+import random
+import time
+from bisect import bisect
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from courses import search
+from courses.cache import CATALOG, CATALOG_CONTENTS, CATALOG_MEMBERS, bump_version
+from courses.counters import refresh_course_counters, refresh_instructor_counters
+from courses.models import Course, Enrollment, Instructor, Lesson, LessonProgress
+from courses.rendering import bio_excerpt, content_html
+from courses.video import video_columns
+
+WORDS = (
+    'algebra algorithms analysis applied architecture calculus cloud compilers computing '
+    'concurrency data databases design discrete distributed economics engineering finance '
+    'foundations graphs history introduction learning linear logic machine modelling '
+    'networks numerical optimisation probability programming python security signals '
+    'statistics storage structures systems theory thinking web writing'
+).split()
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights giving rank ``r`` a share proportional to ``1 / r**exponent``."""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def pick(rng, population, cum_weights):
+    return population[bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic catalog of instructors, courses, lessons, users, '
+        'enrollments and lesson progress for load and benchmark testing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--instructors', type=int, default=100)
+        parser.add_argument('--courses', type=int, default=2000)
+        parser.add_argument('--lessons-per-course', type=int, default=20)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument(
+            '--enrollments-per-user', type=float, default=5,
+            help='Mean enrollments per user; the actual number is exponentially distributed (default: 5).'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Zipf exponent for course and instructor popularity; 0 spreads evenly (default: 1.1).'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42).')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Rows per INSERT statement (default: 5000).'
+        )
+        parser.add_argument(
+            '--username-prefix', default='learner',
+            help='Generated users are named <prefix><n> (default: learner).'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Password given to every generated user (default: password).'
+        )
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Do not index the generated courses and lessons for search.'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batch_size = options['batch_size']
+        if User.objects.filter(username__startswith=options['username_prefix']).exists():
+            raise CommandError(
+                f"Users named {options['username_prefix']}* already exist; "
+                f"pick another --username-prefix."
+            )
+        rng = random.Random(options['seed'])
+
+        instructor_ids = self.insert(Instructor, self.instructors())
+        rng.shuffle(instructor_ids)
+        course_ids = self.insert(Course, self.courses(rng, instructor_ids))
+        lesson_ids = self.insert(Lesson, self.lessons(rng, course_ids))
+        user_ids = self.insert(User, self.users())
+
+        lessons_by_course = {course_id: [] for course_id in course_ids}
+        generated_lessons = Lesson.objects.filter(pk__gte=lesson_ids[0]) if lesson_ids else Lesson.objects.none()
+        rows = generated_lessons.order_by('course_id', 'order').values_list('course_id', 'pk')
+        for course_id, lesson_id in rows.iterator(chunk_size=self.batch_size):
+            lessons_by_course[course_id].append(lesson_id)
+        # Popularity is assigned in shuffled order so it does not follow creation time.
+        popular = list(course_ids)
+        rng.shuffle(popular)
+
+        self.insert(Enrollment, self.enrollments(user_ids, popular, lessons_by_course), keep_ids=False)
+        self.insert(LessonProgress, self.progress(user_ids, popular, lessons_by_course), keep_ids=False)
+
+        started = time.monotonic()
+        for batch in self.batches(iter(course_ids)):
+            refresh_course_counters(batch)
+        refresh_instructor_counters(instructor_ids)
+        self.report('counters', None, started, verb='Refreshed')
+
+        if not options['skip_search_index']:
+            started = time.monotonic()
+            for batch in self.batches(iter(course_ids)):
+                search.index_courses(batch)
+            for batch in self.batches(iter(lesson_ids)):
+                search.index_lessons(batch)
+            self.report('search entries', len(course_ids) + len(lesson_ids), started, verb='Indexed')
+
+        # Bulk inserts send no signals; drop cached catalog pages and ETags.
+        bump_version(CATALOG, CATALOG_MEMBERS)
+        bump_version(CATALOG, CATALOG_CONTENTS)
+
+    def batches(self, rows):
+        return iter(lambda: list(islice(rows, self.batch_size)), [])
+
+    def insert(self, model, rows, keep_ids=True):
+        """
+        Insert ``rows`` (any iterable of unsaved instances) a batch at a time
+        and return the new primary keys, or ``None`` with ``keep_ids=False``.
+        """
+        started = time.monotonic()
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        total = 0
+        for batch in self.batches(iter(rows)):
+            # One commit per batch; bulk_create alone may split it into
+            # several statements (and commits) to respect parameter limits.
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+            if self.options['verbosity'] > 1:
+                self.stdout.write(f'{model.__name__}: {total} rows inserted')
+        self.report(f'{model.__name__} rows', total, started)
+        if keep_ids:
+            return list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+
+    def report(self, label, total, started, verb='Generated'):
+        elapsed = time.monotonic() - started
+        count = '' if total is None else f'{total} '
+        self.stdout.write(self.style.SUCCESS(f'{verb} {count}{label} in {elapsed:.1f}s'))
+
+    def instructors(self):
+        for n in range(self.options['instructors']):
+            bio = f'Teaches {WORDS[n % len(WORDS)]}.'
+            yield Instructor(name=f'Instructor {n}', bio=bio, bio_excerpt=bio_excerpt(bio))
+
+    def courses(self, rng, instructor_ids):
+        weights = zipf_weights(len(instructor_ids), self.options['skew']) if instructor_ids else None
+        for n in range(self.options['courses']):
+            title = ' '.join(rng.sample(WORDS, 3)).title()
+            yield Course(
+                title=f'{title} {n}',
+                short_description=' '.join(rng.choices(WORDS, k=12)).capitalize() + '.',
+                long_description=' '.join(rng.choices(WORDS, k=150)).capitalize() + '.',
+                instructor_id=pick(rng, instructor_ids, weights) if weights else None,
+                lesson_count=self.options['lessons_per_course'],
+            )
+
+    def lessons(self, rng, course_ids):
+        for course_id in course_ids:
+            for order in range(self.options['lessons_per_course']):
+                content = ' '.join(rng.choices(WORDS, k=300)).capitalize() + '.'
+                youtube_url = f'https://www.youtube.com/watch?v={rng.getrandbits(40):011x}' if rng.random() < 0.5 else None
+                # bulk_create bypasses Lesson.save(), which fills the derived fields.
+                yield Lesson(
+                    course_id=course_id,
+                    title=' '.join(rng.sample(WORDS, 4)).capitalize(),
+                    content=content,
+                    content_html=content_html(content),
+                    youtube_url=youtube_url,
+                    order=order,
+                    **video_columns(youtube_url),
+                )
+
+    def users(self):
+        password = make_password(self.options['password'])
+        prefix = self.options['username_prefix']
+        for n in range(self.options['users']):
+            yield User(username=f'{prefix}{n}', email=f'{prefix}{n}@example.com', password=password)
+
+    def learner_plans(self, user_ids, popular, lessons_by_course):
+        """
+        Yield ``(user_id, course_id, viewed_lesson_ids)`` for every generated
+        enrollment. Each user draws from their own seeded generator, so the
+        enrollment and progress passes see the same plans without keeping them.
+        """
+        if not popular:
+            return
+        weights = zipf_weights(len(popular), self.options['skew'])
+        mean = self.options['enrollments_per_user']
+        for n, user_id in enumerate(user_ids):
+            rng = random.Random(f"{self.options['seed']}:{n}")
+            wanted = min(len(popular), round(rng.expovariate(1 / mean))) if mean > 0 else 0
+            chosen = []
+            for _ in range(wanted * 10):
+                if len(chosen) == wanted:
+                    break
+                course_id = pick(rng, popular, weights)
+                if course_id not in chosen:
+                    chosen.append(course_id)
+            for course_id in chosen:
+                lessons = lessons_by_course[course_id]
+                # Most learners drop off early; about one in ten finishes.
+                depth = 1.0 if rng.random() < 0.1 else rng.betavariate(0.7, 2.0)
+                yield user_id, course_id, lessons[:round(len(lessons) * depth)]
+
+    def enrollments(self, user_ids, popular, lessons_by_course):
+        for user_id, course_id, viewed in self.learner_plans(user_ids, popular, lessons_by_course):
+            yield Enrollment(user_id=user_id, course_id=course_id, completed_lessons=len(viewed))
+
+    def progress(self, user_ids, popular, lessons_by_course):
+        for user_id, course_id, viewed in self.learner_plans(user_ids, popular, lessons_by_course):
+            for lesson_id in viewed:
+                yield LessonProgress(user_id=user_id, lesson_id=lesson_id, course_id=course_id)
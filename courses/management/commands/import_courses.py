@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert instructors, courses and lessons from an NDJSON or CSV bundle, '
+        'keyed on their external ids, in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Bundle to import, or '-' for standard input.")
+        parser.add_argument(
+            '--format', choices=['ndjson', 'csv'], dest='fmt',
+            help='Bundle format (default: from the file extension, else ndjson).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE,
+            help=f'Records written per transaction (default: {importer.DEFAULT_BATCH_SIZE}).'
+        )
+
+    def handle(self, *args, path, fmt, batch_size, **options):
+        fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        reader = importer.read_csv if fmt == 'csv' else importer.read_ndjson
+
+        def report(kind, count, stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'{count} {kind}(s) written; {stats.rows} rows at {stats.rows_per_second:.0f} rows/s'
+                )
+
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            stats = importer.Importer(batch_size, on_batch=report).run(reader(source))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        counts = ', '.join(f'{count} {kind}(s)' for kind, count in stats.imported.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {counts} ({stats.rows} rows at {stats.rows_per_second:.0f} rows/s)'
+        ))
+        if stats.rejected:
+            raise CommandError(
+                f'{stats.rejected} record(s) rejected:\n  ' + '\n  '.join(stats.errors)
+            )
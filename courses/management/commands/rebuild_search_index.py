@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from courses import search
+
+
+class Command(BaseCommand):
+    help = 'Reindex every course and lesson in the full-text search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Rows reindexed per statement (default: 500).'
+        )
+
+    def handle(self, *args, batch_size, **options):
+        totals = {}
+        for model, indexed in search.rebuild(batch_size):
+            label = model._meta.verbose_name_plural
+            totals[label] = totals.get(label, 0) + indexed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{label}: {totals[label]} indexed')
+        for label, total in totals.items():
+            self.stdout.write(self.style.SUCCESS(f'Reindexed {total} {label}'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from courses.counters import COUNTERS, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized lesson, enrollment, course and progress counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows checked per transaction (default: 1000).'
+        )
+        parser.add_argument(
+            '--only', choices=[f'{model.__name__}.{field}' for model, field, _ in COUNTERS],
+            action='append',
+            help='Reconcile just this counter; may be given more than once.'
+        )
+        parser.add_argument(
+            '--start-pk', type=int,
+            help='Resume from this primary key (as reported by a previous run).'
+        )
+
+    def handle(self, *args, batch_size, only, start_pk, **options):
+        for model, field, expression in COUNTERS:
+            label = f'{model.__name__}.{field}'
+            if only and label not in only:
+                continue
+            checked_to = start_pk
+            repaired = 0
+            for last_pk, fixed in reconcile(model, field, expression, batch_size, start_pk):
+                checked_to = last_pk
+                repaired += fixed
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{label}: checked up to pk {last_pk}, {repaired} repaired')
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: {repaired} row(s) repaired (checked up to pk {checked_to})'
+            ))
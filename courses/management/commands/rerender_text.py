@@ -0,0 +1,40 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from courses.rendering import RENDERED_FIELDS, rerender
+
+
+class Command(BaseCommand):
+    help = 'Re-render stored lesson HTML and instructor bio excerpts from their source text.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Rows checked per transaction (default: 500).'
+        )
+        parser.add_argument(
+            '--only', choices=[f'{model}.{target}' for model, _, target, _ in RENDERED_FIELDS],
+            action='append',
+            help='Re-render just this field; may be given more than once.'
+        )
+        parser.add_argument(
+            '--start-pk', type=int,
+            help='Resume from this primary key (as reported by a previous run).'
+        )
+
+    def handle(self, *args, batch_size, only, start_pk, **options):
+        for model_name, source, target, render in RENDERED_FIELDS:
+            label = f'{model_name}.{target}'
+            if only and label not in only:
+                continue
+            model = apps.get_model('courses', model_name)
+            checked_to = start_pk
+            updated = 0
+            for last_pk, changed in rerender(model, source, target, render, batch_size, start_pk):
+                checked_to = last_pk
+                updated += changed
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{label}: checked up to pk {last_pk}, {updated} updated')
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: {updated} row(s) updated (checked up to pk {checked_to})'
+            ))
@@ -0,0 +1,79 @@
+"""
+Prometheus metrics.
+
+Request latency and queries per request are recorded by
+``RequestProfilingMiddleware``; fragment and page cache lookups,
+enrollments and lesson progress writes where they happen. ``/metrics`` serves them in the
+Prometheus text format.
+
+Under gunicorn each worker is a separate process. Set
+``PROMETHEUS_MULTIPROC_DIR`` to an empty, writable directory before the
+server starts and every worker writes its samples to memory-mapped files
+there, which ``/metrics`` merges, so one scrape covers all workers.
+Without it, the metrics are those of the process that answers the scrape.
+"""
+import os
+
+from django.db import transaction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+REQUEST_LATENCY = Histogram(
+    'mooc_request_duration_seconds', 'Time spent serving a request, by view.',
+    ['view', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'mooc_request_db_queries', 'Database queries run while serving a request, by view.',
+    ['view'], buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf')),
+)
+FRAGMENT_CACHE_LOOKUPS = Counter(
+    'mooc_fragment_cache_lookups', 'Cached template fragment lookups, by result.',
+    ['result'],
+)
+PAGE_CACHE_LOOKUPS = Counter(
+    'mooc_page_cache_lookups', 'Anonymous full-page cache lookups, by result.',
+    ['result'],
+)
+ENROLLMENTS_CREATED = Counter('mooc_enrollments_created', 'Enrollments created.')
+LESSON_PROGRESS_WRITTEN = Counter(
+    'mooc_lesson_progress_written', 'Lesson views written to the database, by path.',
+    ['mode'],
+)
+
+
+def observe_request(request, response, queries, seconds):
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    REQUEST_LATENCY.labels(view, request.method).observe(seconds)
+    REQUEST_QUERIES.labels(view).observe(queries)
+
+
+def record_fragment_lookup(hit):
+    FRAGMENT_CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def record_page_lookup(hit):
+    PAGE_CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def record_enrollment():
+    transaction.on_commit(ENROLLMENTS_CREATED.inc)
+
+
+def record_progress_written(count, mode):
+    transaction.on_commit(lambda: LESSON_PROGRESS_WRITTEN.labels(mode).inc(count))
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def render():
+    """Return ``(body, content_type)`` for a scrape."""
+    registry = REGISTRY
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
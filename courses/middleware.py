@@ -0,0 +1,190 @@
+"""
+Per-request performance instrumentation.
+
+``RequestProfilingMiddleware`` counts and times every SQL statement through
+an execute wrapper installed on each database connection and times
+top-level template rendering. The request's profile is found through a
+context variable, so queries and renders that async views run in other
+threads are counted too. It feeds the request metrics in
+``courses.metrics``, and requests slower than ``SLOW_REQUEST_THRESHOLD_MS``
+are logged to ``courses.performance`` as one JSON object that includes
+the most repeated statements, which is where N+1 query patterns show up.
+
+Responses get a ``Server-Timing`` header with the totals only for staff
+users, with ``DEBUG`` on or with ``SERVER_TIMING_PUBLIC`` set; anyone
+else could use it to probe which pages reach the database.
+
+Statements are grouped by their SQL text, which still has its parameter
+placeholders, so the per-query cost is a clock read and a dict update.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+from . import metrics
+
+logger = logging.getLogger('courses.performance')
+
+TOP_QUERIES = 5
+
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Query and template timings collected while serving one request.
+
+    Async views run queries on several threads at once (see
+    ``courses.concurrency``), so the totals are updated under a lock.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = {}
+        self._render_depth = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.db_seconds += elapsed
+                count, seconds = self.statements.get(sql, (0, 0.0))
+                self.statements[sql] = (count + 1, seconds + elapsed)
+
+    def top_statements(self, limit=TOP_QUERIES):
+        """Return the most executed statements, most frequent first."""
+        ranked = sorted(self.statements.items(), key=lambda item: (-item[1][0], -item[1][1]))
+        return [
+            {'sql': sql, 'count': count, 'ms': round(seconds * 1000, 2)}
+            for sql, (count, seconds) in ranked[:limit]
+        ]
+
+    def server_timing(self, total_seconds):
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ])
+
+
+def _profiled_execute(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def _install_query_profiler(sender=None, connection=None, **kwargs):
+    # First in the list, so execute_wrapper() blocks still pop their own.
+    if _profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _profiled_execute)
+
+
+_original_render = Template.render
+
+
+def _profiled_render(self, *args, **kwargs):
+    profile = _current_profile.get()
+    if profile is None:
+        return _original_render(self, *args, **kwargs)
+    # Templates rendered while another one renders (render_to_string in a
+    # tag, say) are already inside the outer measurement.
+    profile._render_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, *args, **kwargs)
+    finally:
+        profile._render_depth -= 1
+        if not profile._render_depth:
+            with profile._lock:
+                profile.template_seconds += time.perf_counter() - started
+
+
+def _shows_server_timing(request):
+    if settings.DEBUG or getattr(settings, 'SERVER_TIMING_PUBLIC', False):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class RequestProfilingMiddleware:
+    """Time every request, add ``Server-Timing`` for staff and log slow requests."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500) / 1000
+        Template.render = _profiled_render
+        connection_created.connect(_install_query_profiler, dispatch_uid='request_profiling')
+        for connection in connections.all(initialized_only=True):
+            _install_query_profiler(connection=connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        total = time.perf_counter() - started
+        return self.finish(request, response, profile, total, _shows_server_timing(request))
+
+    async def _acall(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        total = time.perf_counter() - started
+        # The user may still have to be loaded from the session.
+        shows_timing = await sync_to_async(_shows_server_timing)(request)
+        return self.finish(request, response, profile, total, shows_timing)
+
+    def finish(self, request, response, profile, total, shows_timing):
+        if shows_timing:
+            response['Server-Timing'] = profile.server_timing(total)
+        metrics.observe_request(request, response, profile.queries, total)
+        if total >= self.slow_threshold:
+            self.log_slow_request(request, response, profile, total)
+        return response
+
+    def log_slow_request(self, request, response, profile, total):
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(profile.db_seconds * 1000, 1),
+            'template_ms': round(profile.template_seconds * 1000, 1),
+            'queries': profile.queries,
+            'top_queries': profile.top_statements(),
+        }))
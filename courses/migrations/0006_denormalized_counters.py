@@ -0,0 +1,70 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:21
+
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery
+
+
+def count_subquery(queryset):
+    return Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count')
+    )
+
+
+def populate_counters(apps, schema_editor):
+    """
+    Fill the new counters from the existing rows. Very large tables can skip
+    this step by faking the migration and running reconcile_counters, which
+    does the same work in small batches.
+    """
+    Instructor = apps.get_model('courses', 'Instructor')
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    LessonProgress = apps.get_model('courses', 'LessonProgress')
+
+    Instructor.objects.update(
+        course_count=count_subquery(Course.objects.filter(instructor=OuterRef('pk')))
+    )
+    Course.objects.update(
+        lesson_count=count_subquery(Lesson.objects.filter(course=OuterRef('pk'))),
+        enrollment_count=count_subquery(Enrollment.objects.filter(course=OuterRef('pk'))),
+    )
+    Enrollment.objects.update(
+        completed_lessons=count_subquery(
+            LessonProgress.objects.filter(
+                user=OuterRef('user_id'),
+                lesson__course=OuterRef('course_id')
+            )
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_catalog_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='instructor',
+            name='course_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    'ALTER TABLE courses_course ADD COLUMN search_vector tsvector',
+    'ALTER TABLE courses_lesson ADD COLUMN search_vector tsvector',
+    'CREATE INDEX course_search_vector_idx ON courses_course USING gin (search_vector)',
+    'CREATE INDEX lesson_search_vector_idx ON courses_lesson USING gin (search_vector)',
+    """
+    UPDATE courses_course SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(short_description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT name FROM courses_instructor WHERE courses_instructor.id = courses_course.instructor_id
+        ), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(long_description, '')), 'C')
+    """,
+    """
+    UPDATE courses_lesson SET search_vector =
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'D')
+    """,
+]
+POSTGRES_BACKWARD = [
+    'ALTER TABLE courses_course DROP COLUMN search_vector',
+    'ALTER TABLE courses_lesson DROP COLUMN search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE courses_search_fts USING fts5(
+        kind UNINDEXED, course_id UNINDEXED, title, body, instructor,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    INSERT INTO courses_search_fts (rowid, kind, course_id, title, body, instructor)
+    SELECT c.id * 2, 'course', c.id, c.title,
+           c.short_description || ' ' || c.long_description, coalesce(i.name, '')
+    FROM courses_course c LEFT JOIN courses_instructor i ON i.id = c.instructor_id
+    """,
+    """
+    INSERT INTO courses_search_fts (rowid, kind, course_id, title, body, instructor)
+    SELECT id * 2 + 1, 'lesson', course_id, title, content, ''
+    FROM courses_lesson
+    """,
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS courses_search_fts',
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Create the full-text index described in ``courses.search``. The
+    structures live outside the model state, so Django never selects or
+    writes them through the ORM.
+    """
+
+    dependencies = [
+        ('courses', '0006_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+INDEX_NAME = 'progress_user_course_idx'
+
+
+def create_index(apps, schema_editor):
+    """
+    Build the (user, course) index. PostgreSQL builds it CONCURRENTLY so
+    writes to the progress table are not blocked while it runs.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+            'ON courses_lessonprogress (user_id, course_id)'
+        )
+    else:
+        LessonProgress = apps.get_model('courses', 'LessonProgress')
+        schema_editor.add_index(
+            LessonProgress, models.Index(fields=['user', 'course'], name=INDEX_NAME)
+        )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('courses', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='course',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='lesson_progress', to='courses.course'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='lessonprogress',
+                    index=models.Index(fields=['user', 'course'], name=INDEX_NAME),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_index, drop_index),
+            ],
+        ),
+    ]
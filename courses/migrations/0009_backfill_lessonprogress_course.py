@@ -0,0 +1,49 @@
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 10000
+
+
+def backfill_course(apps, schema_editor):
+    """
+    Copy lesson.course_id onto existing progress rows.
+
+    Rows are walked in primary key order in batches of BATCH_SIZE, each
+    batch in its own short transaction, so the table is never locked for
+    long. If the migration is interrupted, running it again resumes from
+    the first row that still has no course.
+    """
+    LessonProgress = apps.get_model('courses', 'LessonProgress')
+    Lesson = apps.get_model('courses', 'Lesson')
+    lesson_course = Subquery(Lesson.objects.filter(pk=OuterRef('lesson_id')).values('course_id')[:1])
+
+    first = LessonProgress.objects.filter(course__isnull=True).order_by('pk').values_list('pk', flat=True).first()
+    if first is None:
+        return
+    last_pk = first - 1
+    while True:
+        pks = list(
+            LessonProgress.objects.filter(pk__gt=last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        with transaction.atomic(using=schema_editor.connection.alias):
+            LessonProgress.objects.filter(
+                pk__gte=pks[0], pk__lte=pks[-1], course__isnull=True
+            ).update(course=lesson_course)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('courses', '0008_lessonprogress_course'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_course, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def renumber_duplicate_orders(apps, schema_editor):
+    """
+    Give every lesson in a course a distinct order before the unique
+    constraint is added. Only courses that actually have duplicates are
+    renumbered, keeping their current sequence with creation time as the
+    tie-breaker.
+    """
+    Lesson = apps.get_model('courses', 'Lesson')
+    duplicates = (
+        Lesson.objects.order_by().values('course_id', 'order')
+        .annotate(lessons=Count('pk'))
+        .filter(lessons__gt=1)
+    )
+    for course_id in {row['course_id'] for row in duplicates}:
+        lessons = list(
+            Lesson.objects.filter(course_id=course_id)
+            .order_by('order', 'created_at', 'pk')
+            .only('pk', 'order')
+        )
+        for position, lesson in enumerate(lessons):
+            lesson.order = position
+        Lesson.objects.bulk_update(lessons, ['order'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_backfill_lessonprogress_course'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='lesson',
+            options={'ordering': ['course', 'order']},
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='order',
+            field=models.PositiveIntegerField(blank=True, help_text='Position within the course; leave blank to add at the end'),
+        ),
+        migrations.RunPython(renumber_duplicate_orders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('course', 'order'), name='lesson_course_order_uniq'),
+        ),
+    ]
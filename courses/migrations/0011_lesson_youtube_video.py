@@ -0,0 +1,114 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:56
+
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+
+# A frozen copy of the URL parsing in courses/video.py as it stood when
+# the columns were added; later changes there must not alter this migration.
+VIDEO_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+TIMESTAMP = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+EMBED_BASE = 'https://www.youtube.com/embed/'
+ID_PATHS = {'embed', 'shorts', 'live', 'v', 'e'}
+
+
+def _is_youtube_host(host):
+    host = host.lower().split(':')[0]
+    return host in ('youtube.com', 'youtube-nocookie.com') or host.endswith(
+        ('.youtube.com', '.youtube-nocookie.com')
+    )
+
+
+def _seconds(value):
+    match = TIMESTAMP.match(value or '')
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_youtube_url(url):
+    """Return ``(video_id, start_seconds)`` for a YouTube URL, or ``(None, None)``."""
+    try:
+        parts = urlsplit((url or '').strip())
+    except ValueError:
+        return None, None
+    if not parts.netloc and parts.path.startswith(('youtube.com/', 'www.youtube.com/', 'youtu.be/')):
+        parts = urlsplit('https://' + url.strip())
+    host = parts.netloc.lower().split(':')[0]
+    query = parse_qs(parts.query)
+    segments = [segment for segment in parts.path.split('/') if segment]
+
+    video_id = None
+    if host in ('youtu.be', 'www.youtu.be'):
+        video_id = segments[0] if segments else None
+    elif _is_youtube_host(host):
+        if segments[:1] == ['watch']:
+            video_id = query.get('v', [None])[0]
+        elif len(segments) >= 2 and segments[0] in ID_PATHS:
+            video_id = segments[1]
+    if not video_id or not VIDEO_ID.match(video_id):
+        return None, None
+
+    fragment = parse_qs(parts.fragment)
+    for params in (query, fragment):
+        for name in ('t', 'start'):
+            if name in params:
+                return video_id, _seconds(params[name][0])
+    return video_id, None
+
+
+def video_columns(url):
+    """Return the ``youtube_video_id`` and ``youtube_embed_url`` values for ``url``."""
+    video_id, start = parse_youtube_url(url)
+    if not video_id:
+        return {'youtube_video_id': '', 'youtube_embed_url': ''}
+    embed_url = EMBED_BASE + video_id
+    return {
+        'youtube_video_id': video_id,
+        'youtube_embed_url': f'{embed_url}?start={start}' if start else embed_url,
+    }
+
+
+def parse_existing_urls(apps, schema_editor):
+    """Parse the URLs of existing lessons, one committed batch at a time."""
+    Lesson = apps.get_model('courses', 'Lesson')
+    lessons = Lesson.objects.exclude(youtube_url='').order_by('pk').only('pk', 'youtube_url')
+    last_pk = None
+    while True:
+        batch = list((lessons if last_pk is None else lessons.filter(pk__gt=last_pk))[:BATCH_SIZE])
+        if not batch:
+            return
+        for lesson in batch:
+            for name, value in video_columns(lesson.youtube_url).items():
+                setattr(lesson, name, value)
+        with transaction.atomic(using=schema_editor.connection.alias):
+            Lesson.objects.bulk_update(batch, ['youtube_video_id', 'youtube_embed_url'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each backfill batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('courses', '0010_lesson_course_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='youtube_embed_url',
+            field=models.URLField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='youtube_video_id',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=11),
+        ),
+        migrations.RunPython(parse_existing_urls, migrations.RunPython.noop, elidable=True),
+    ]
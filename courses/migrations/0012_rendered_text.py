@@ -0,0 +1,64 @@
+# Generated by Django 4.2.28 on 2026-10-18 09:58
+
+from django.db import migrations, models, transaction
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+
+
+# Frozen copies of the renderers in courses/rendering.py as they stood when
+# the columns were added; later changes there must not alter this migration.
+def content_html(content):
+    return linebreaks(content or '', autoescape=True)
+
+
+def bio_excerpt(bio):
+    return Truncator(bio or '').words(50, truncate=' …')
+
+
+RENDERED_FIELDS = [
+    ('Lesson', 'content', 'content_html', content_html),
+    ('Instructor', 'bio', 'bio_excerpt', bio_excerpt),
+]
+
+
+def render_existing_text(apps, schema_editor):
+    """Render the text of existing rows, one committed batch at a time."""
+    for model_name, source, target, render in RENDERED_FIELDS:
+        model = apps.get_model('courses', model_name)
+        rows = model.objects.order_by('pk').only('pk', source)
+        last_pk = None
+        while True:
+            batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:BATCH_SIZE])
+            if not batch:
+                break
+            for row in batch:
+                setattr(row, target, render(getattr(row, source)))
+            with transaction.atomic(using=schema_editor.connection.alias):
+                model.objects.bulk_update(batch, [target])
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('courses', '0011_lesson_youtube_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instructor',
+            name='bio_excerpt',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(render_existing_text, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.28 on 2026-10-18 10:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_external_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lessonprogress',
+            name='course',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progress', to='courses.course'),
+        ),
+    ]
@@ -1,13 +1,40 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.dispatch import Signal
+
+from .rendering import bio_excerpt, content_html
+from .video import video_columns
+
+
+def _derive(instance, save_kwargs, source, derive):
+    """
+    Set the fields ``derive(value of source)`` returns, as a dict, and save
+    them along with ``source``. Skipped when ``source`` is not loaded or
+    not among the ``update_fields`` being saved.
+    """
+    update_fields = save_kwargs.get('update_fields')
+    if source in instance.get_deferred_fields() or (
+        update_fields is not None and source not in update_fields
+    ):
+        return
+    derived = derive(getattr(instance, source))
+    for name, value in derived.items():
+        setattr(instance, name, value)
+    if update_fields is not None:
+        save_kwargs['update_fields'] = {*update_fields, *derived}
 
 
 class Instructor(models.Model):
     """Model representing a course instructor."""
     name = models.CharField(max_length=200)
+    # Stable id from the system a row was imported from (see courses.importer).
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     bio = models.TextField(blank=True, help_text="Short biography of the instructor")
+    # Rendered from bio on save (see courses.rendering).
+    bio_excerpt = models.TextField(blank=True, default='', editable=False)
     profile_pic_url = models.URLField(max_length=500, blank=True, null=True, help_text="Public URL for profile picture")
     website = models.URLField(max_length=500, blank=True, null=True)
+    course_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -16,6 +43,10 @@ class Instructor(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        _derive(self, kwargs, 'bio', lambda bio: {'bio_excerpt': bio_excerpt(bio)})
+        super().save(*args, **kwargs)
+
     def get_profile_pic_url(self):
         """Return profile pic URL or None."""
         return self.profile_pic_url
@@ -24,15 +55,22 @@ class Instructor(models.Model):
 class Course(models.Model):
     """Model representing a course in the catalog."""
     title = models.CharField(max_length=200)
+    # Stable id from the system a row was imported from (see courses.importer).
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     short_description = models.CharField(max_length=500)
     long_description = models.TextField()
     thumbnail_url = models.URLField(max_length=500, blank=True, null=True, help_text="Public URL for course thumbnail image")
     instructor = models.ForeignKey(Instructor, on_delete=models.SET_NULL, null=True, blank=True, related_name='courses')
+    lesson_count = models.PositiveIntegerField(default=0, editable=False)
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='course_catalog_order_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -46,38 +84,90 @@ class Lesson(models.Model):
     """Model representing a lesson within a course."""
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
     title = models.CharField(max_length=200)
+    # Stable id from the system a row was imported from (see courses.importer).
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     content = models.TextField()
+    # Rendered from content on save (see courses.rendering).
+    content_html = models.TextField(blank=True, default='', editable=False)
     youtube_url = models.URLField(max_length=500, blank=True, null=True, help_text="Optional YouTube video URL")
-    order = models.PositiveIntegerField(default=0)
+    # Parsed from youtube_url on save; empty when it is not a YouTube video.
+    youtube_video_id = models.CharField(max_length=11, blank=True, default='', editable=False, db_index=True)
+    youtube_embed_url = models.URLField(blank=True, default='', editable=False)
+    order = models.PositiveIntegerField(blank=True, help_text="Position within the course; leave blank to add at the end")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def get_youtube_embed_url(self):
-        """Convert YouTube URL to embed URL."""
-        if not self.youtube_url:
-            return None
-        url = self.youtube_url
-        if 'youtube.com/watch?v=' in url:
-            video_id = url.split('watch?v=')[1].split('&')[0]
-            return f'https://www.youtube.com/embed/{video_id}'
-        elif 'youtu.be/' in url:
-            video_id = url.split('youtu.be/')[1].split('?')[0]
-            return f'https://www.youtube.com/embed/{video_id}'
-        elif 'youtube.com/embed/' in url:
-            return url
-        return None
+        """Return the embed URL for the lesson's video, or None."""
+        return self.youtube_embed_url or None
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['course', 'order']
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'order'], name='lesson_course_order_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        if self.order is None:
+            last = Lesson.objects.filter(course_id=self.course_id).aggregate(last=models.Max('order'))['last']
+            self.order = 0 if last is None else last + 1
+        _derive(self, kwargs, 'youtube_url', video_columns)
+        _derive(self, kwargs, 'content', lambda content: {'content_html': content_html(content)})
+        super().save(*args, **kwargs)
+
+    def get_previous_lesson(self):
+        """Return the lesson before this one in its course, or None."""
+        return Lesson.objects.filter(course_id=self.course_id, order__lt=self.order).only(
+            'id', 'course', 'title', 'order'
+        ).order_by('-order').first()
+
+    def get_next_lesson(self):
+        """Return the lesson after this one in its course, or None."""
+        return Lesson.objects.filter(course_id=self.course_id, order__gt=self.order).only(
+            'id', 'course', 'title', 'order'
+        ).order_by('order').first()
+
+
+# Sent with ``keys``, the ``(user_id, course_id)`` pairs of the rows, after
+# enrollments or lesson progress are deleted directly. These tables get no
+# pre_delete/post_delete receivers, which would stop Django from deleting
+# their rows in bulk when a course, lesson or user is deleted; the
+# receivers in ``courses.signals`` handle those cascades instead.
+rows_deleted = Signal()
+
+
+class UserCourseQuerySet(models.QuerySet):
+    """A queryset whose ``delete()`` sends :data:`rows_deleted`."""
+
+    def delete(self):
+        keys = set(self.order_by().values_list('user_id', 'course_id').distinct())
+        result = super().delete()
+        if keys:
+            rows_deleted.send(sender=self.model, keys=keys)
+        return result
 
-class Enrollment(models.Model):
+
+class UserCourseRow(models.Model):
+    """Base for rows keyed by user and course, whose deletes send :data:`rows_deleted`."""
+    objects = UserCourseQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        rows_deleted.send(sender=type(self), keys={(self.user_id, self.course_id)})
+        return result
+
+
+class Enrollment(UserCourseRow):
     """Model representing a user's enrollment in a course."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
+    completed_lessons = models.PositiveIntegerField(default=0, editable=False)
     enrolled_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -88,15 +178,29 @@ class Enrollment(models.Model):
         return f"{self.user.username} - {self.course.title}"
 
 
-class LessonProgress(models.Model):
+class LessonProgress(UserCourseRow):
     """Model tracking a user's progress on a lesson."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_progress')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='progress')
+    # Copy of lesson.course so progress can be filtered by course without a
+    # join. The (user, course) index replaces the usual single-column FK index.
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='lesson_progress',
+        null=True, editable=False, db_index=False
+    )
     viewed_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['user', 'lesson']
         ordering = ['-viewed_at']
+        indexes = [
+            models.Index(fields=['user', 'course'], name='progress_user_course_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} viewed {self.lesson.title}"
+
+    def save(self, *args, **kwargs):
+        if self.course_id is None and self.lesson_id is not None:
+            self.course_id = self.lesson.course_id
+        super().save(*args, **kwargs)
@@ -0,0 +1,34 @@
+"""
+Moving lessons within a course.
+
+Lessons are sequenced by a unique ``(course, order)`` pair, so reordering
+has to avoid passing through a state where two lessons share a position.
+"""
+from django.db import transaction
+from django.db.models import F, Max
+
+from .cache import COURSE, bump_version
+from .models import Lesson
+
+
+def reorder_lessons(course, orders):
+    """
+    Move lessons of ``course`` to new positions; ``orders`` maps lesson id
+    to its new order. Runs one UPDATE to park the moved lessons and one
+    ``bulk_update`` to place them, however many lessons move.
+    """
+    if not orders:
+        return
+    with transaction.atomic():
+        lessons = list(Lesson.objects.filter(course=course, pk__in=orders).only('id', 'order'))
+        # The unique constraint is checked row by row, so swapping two
+        # positions in a single UPDATE would collide. Park the moved lessons
+        # beyond every current and requested position first.
+        top = Lesson.objects.filter(course=course).aggregate(top=Max('order'))['top'] or 0
+        offset = max(top, *orders.values()) + 1
+        Lesson.objects.filter(pk__in=[lesson.pk for lesson in lessons]).update(order=F('order') + offset)
+        for lesson in lessons:
+            lesson.order = orders[lesson.pk]
+        Lesson.objects.bulk_update(lessons, ['order'])
+    # bulk_update sends no signals, so invalidate the cached lesson lists here.
+    bump_version(COURSE, course.pk)
@@ -0,0 +1,140 @@
+"""
+Full-page caching for anonymous visitors.
+
+Logged-out visitors all see the same catalog and course pages, so
+:func:`cache_anonymous_page` stores the rendered response in the
+``pages`` cache together with the course, instructor and catalog versions
+it was rendered from (see ``courses.cache``). A hit costs two cache
+reads, one for the page and one for its versions, and never touches the
+ORM; any change to an object the page showed bumps one of those versions
+and the page is rendered again.
+
+Requests are only served from or stored in the cache when the visitor is
+logged out and has no pending messages, and responses are only stored
+when they are a plain 200 that set no cookies, used no CSRF token and
+added no messages, so nothing specific to one visitor is ever shared.
+Async views are cached the same way, with the cache calls made in a thread.
+
+Pages are keyed by path and the query parameters the view reads, so other
+parameters and the Host header cannot create extra entries.
+"""
+import asyncio
+from functools import partial, wraps
+from hashlib import sha256
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import metrics
+from .cache import recording_versions, versions_current
+
+# Stored with the page so cached hits still answer conditional requests.
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+def page_cache():
+    return caches['pages']
+
+
+def _page_key(request, params):
+    query = urlencode([(name, request.GET[name]) for name in params if request.GET.get(name)])
+    return 'page:' + sha256(f'{request.path}?{query}'.encode()).hexdigest()
+
+
+def _cacheable_request(request):
+    return (
+        getattr(settings, 'PAGE_CACHE_ENABLED', True)
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def _cacheable_response(request, response, versions):
+    storage = getattr(request, '_messages', None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not getattr(storage, 'added_new', False)
+        and bool(versions)
+    )
+
+
+def _cached_response(request, key):
+    """Return the cached page for ``request`` if its versions are current."""
+    entry = page_cache().get(key)
+    if entry is None or not versions_current(entry['versions']):
+        metrics.record_page_lookup(hit=False)
+        return None
+    metrics.record_page_lookup(hit=True)
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response['X-Page-Cache'] = 'hit'
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+        response=response,
+    )
+
+
+def _store(request, key, response, versions):
+    if _cacheable_response(request, response, versions):
+        page_cache().set(key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {
+                header: response[header] for header in VALIDATOR_HEADERS if header in response
+            },
+            'versions': versions,
+        }, getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60))
+        response['X-Page-Cache'] = 'miss'
+
+
+def cache_anonymous_page(view=None, *, params=()):
+    """
+    Serve ``view`` to anonymous visitors from the page cache when possible.
+    ``params`` names the query parameters the view reads; the page is
+    cached separately for each combination of their values.
+    """
+    if view is None:
+        return partial(cache_anonymous_page, params=params)
+    if asyncio.iscoroutinefunction(view):
+        return _cache_anonymous_page_async(view, params)
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+        key = _page_key(request, params)
+        response = _cached_response(request, key)
+        if response is None:
+            with recording_versions() as versions:
+                response = view(request, *args, **kwargs)
+            _store(request, key, response, versions)
+        return response
+    return wrapped
+
+
+def _cache_anonymous_page_async(view, params):
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if not await sync_to_async(_cacheable_request)(request):
+            return await view(request, *args, **kwargs)
+        key = _page_key(request, params)
+        response = await sync_to_async(_cached_response)(request, key)
+        if response is None:
+            with recording_versions() as versions:
+                response = await view(request, *args, **kwargs)
+            await sync_to_async(_store)(request, key, response, versions)
+        return response
+    return wrapped
@@ -0,0 +1,164 @@
+"""
+Pagination for large tables.
+
+Keyset (cursor) pagination: unlike offset pagination, fetching a page
+never scans the rows before it: each page filters on the sort key of the
+last row it showed, which an index on the ordering columns answers
+directly. Cursors are opaque, URL-safe strings that encode those sort
+key values.
+
+:class:`EstimatedCountPaginator` keeps the page-number interface of
+Django's ``Paginator`` (which the admin needs) but never counts more rows
+than it has to.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor cannot be decoded for the paginated queryset."""
+
+
+class KeysetPage:
+    """A single page of results with cursors for its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering``, a sequence of field names with an
+    optional leading ``-`` for descending order. The last field must be
+    unique (normally ``id``) so every row has a distinct position.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following cursor ``after``, the page preceding
+        cursor ``before``, or the first page when neither is given.
+        """
+        if before:
+            position = self.decode_cursor(before)
+            rows = list(
+                self.queryset.filter(self._beyond(position, reverse=True))
+                .order_by(*self._reversed_ordering())[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            previous_cursor = self.encode_cursor(rows[0]) if has_more and rows else None
+            next_cursor = self.encode_cursor(rows[-1]) if rows else None
+            return KeysetPage(rows, next_cursor, previous_cursor)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if after:
+            queryset = queryset.filter(self._beyond(self.decode_cursor(after)))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self.encode_cursor(rows[-1]) if has_more else None
+        previous_cursor = self.encode_cursor(rows[0]) if after and rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def encode_cursor(self, obj):
+        """Return the cursor pointing at ``obj`` (a model instance or dict)."""
+        values = []
+        for name in self.fields:
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return the sort key values encoded in ``cursor``."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError('cursor has the wrong number of values')
+            return [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception as exc:
+            raise InvalidCursor(f'Invalid cursor: {cursor!r}') from exc
+
+    def _reversed_ordering(self):
+        return [name.lstrip('-') if desc else f'-{name}' for name, desc in zip(self.fields, self.descending)]
+
+    def _beyond(self, position, reverse=False):
+        """Return a Q matching rows strictly after ``position`` in sort order."""
+        clauses = []
+        for i, name in enumerate(self.fields):
+            descending = self.descending[i] != reverse
+            lookup = 'lt' if descending else 'gt'
+            equal = {self.fields[j]: position[j] for j in range(i)}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': position[i]}))
+        return reduce(or_, clauses)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A ``Paginator`` whose count is cheap on very large tables.
+
+    An unfiltered queryset on PostgreSQL is counted from the planner's row
+    estimate for the table when that is above ``max_count``. Anything else
+    is counted only up to ``max_count`` rows, so pages beyond that are not
+    linked; narrow the list with a filter or search to reach them.
+    """
+
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimated_rows(queryset)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+        return queryset[:self.max_count].count()
+
+    def estimated_rows(self, queryset):
+        """Return the database's row estimate for the queryset's table, or None."""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0 on older servers) until the table is analyzed.
+        return row[0] if row and row[0] > 0 else None
@@ -0,0 +1,124 @@
+"""
+Learner progress computed in bulk.
+
+Every function here answers for a whole set of enrollments with a fixed
+number of queries, so pages cost the same for a learner with one
+enrollment as for one with a hundred.
+
+Views still waiting in the write-behind buffer (see ``courses.tracking``)
+count as viewed here too.
+"""
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Enrollment, Lesson, LessonProgress
+from .tracking import pending_lesson_ids, pending_views
+
+
+def viewed_lesson_ids(user, course):
+    """
+    Return the set of lesson ids in ``course`` the user has viewed,
+    including views still waiting in the write-behind buffer.
+    """
+    return set(
+        LessonProgress.objects.filter(
+            user=user,
+            course=course
+        ).values_list('lesson_id', flat=True)
+    ) | pending_lesson_ids(user, course)
+
+
+def _unsaved_views(user):
+    """
+    Return ``{lesson_id: course_id}`` for the user's buffered views of
+    lessons not already recorded; one query, and none when nothing is buffered.
+    """
+    pending = pending_views(user)
+    if pending:
+        for lesson_id in LessonProgress.objects.filter(
+            user=user, lesson_id__in=pending
+        ).values_list('lesson_id', flat=True):
+            del pending[lesson_id]
+    return pending
+
+
+def _enrollments(user, course_ids, unsaved):
+    course_lessons = Lesson.objects.filter(course=OuterRef('course_id'))
+    unviewed = course_lessons.exclude(progress__user=user)
+    if unsaved:
+        unviewed = unviewed.exclude(pk__in=list(unsaved))
+    enrollments = Enrollment.objects.filter(user=user).select_related(
+        'course__instructor'
+    ).annotate(
+        next_lesson_id=Coalesce(
+            Subquery(unviewed.values('pk')[:1]),
+            Subquery(course_lessons.values('pk')[:1]),
+        )
+    )
+    if course_ids is not None:
+        enrollments = enrollments.filter(course_id__in=course_ids)
+    return enrollments
+
+
+def _next_lesson_ids(enrollments):
+    return [e.next_lesson_id for e in enrollments if e.next_lesson_id is not None]
+
+
+def _next_lessons():
+    return Lesson.objects.only('id', 'course', 'title', 'order')
+
+
+def _progress_items(enrollments, next_lessons, unsaved):
+    unsaved_counts = Counter(unsaved.values())
+    results = []
+    for enrollment in enrollments:
+        total_lessons = enrollment.course.lesson_count
+        completed_lessons = min(
+            enrollment.completed_lessons + unsaved_counts[enrollment.course_id], total_lessons
+        )
+        progress_percent = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
+        results.append({
+            'enrollment': enrollment,
+            'course': enrollment.course,
+            'total_lessons': total_lessons,
+            'completed_lessons': completed_lessons,
+            'progress_percent': round(progress_percent),
+            'next_lesson': next_lessons.get(enrollment.next_lesson_id),
+        })
+    return results
+
+
+def enrollment_progress(user, course_ids=None):
+    """
+    Return progress for the user's enrollments, newest enrollment first.
+
+    Each item is a dict with ``enrollment``, ``course``, ``completed_lessons``,
+    ``total_lessons``, ``progress_percent`` and ``next_lesson`` (the first
+    lesson not yet viewed, or the first lesson for review once everything
+    has been viewed). Pass ``course_ids`` to restrict the result to those
+    courses. Counts come from the stored counters and the next lesson from
+    a correlated subquery, so this runs two queries regardless of the
+    number of enrollments (three while views are buffered).
+    """
+    unsaved = _unsaved_views(user)
+    enrollments = list(_enrollments(user, course_ids, unsaved))
+    next_lesson_ids = _next_lesson_ids(enrollments)
+    next_lessons = _next_lessons().in_bulk(next_lesson_ids) if next_lesson_ids else {}
+    return _progress_items(enrollments, next_lessons, unsaved)
+
+
+async def aenrollment_progress(user, course_ids=None):
+    """Async :func:`enrollment_progress`, on the async ORM."""
+    unsaved = await sync_to_async(_unsaved_views)(user)
+    enrollments = [enrollment async for enrollment in _enrollments(user, course_ids, unsaved)]
+    next_lesson_ids = _next_lesson_ids(enrollments)
+    next_lessons = await _next_lessons().ain_bulk(next_lesson_ids) if next_lesson_ids else {}
+    return _progress_items(enrollments, next_lessons, unsaved)
+
+
+def enrollment_progress_by_course(user, course_ids=None):
+    """Return :func:`enrollment_progress` keyed by course id."""
+    return {item['course'].id: item for item in enrollment_progress(user, course_ids)}
@@ -0,0 +1,85 @@
+"""
+Text fields rendered once, when they are saved.
+
+Lesson content goes through ``linebreaks`` and instructor bios through
+``truncatewords:50`` on every page that shows them. Both results are
+stored next to their source instead (``Lesson.content_html`` and
+``Instructor.bio_excerpt``), so templates only emit stored strings.
+:func:`rerender` brings the stored values up to date in bulk after the
+rendering changes, or for rows written without ``save()``.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from .cache import CATALOG, CATALOG_CONTENTS, COURSE, INSTRUCTOR, bump_version
+
+BIO_EXCERPT_WORDS = 50
+
+
+def content_html(content):
+    """Return lesson content as escaped HTML paragraphs, like ``|linebreaks``."""
+    return linebreaks(content or '', autoescape=True)
+
+
+def bio_excerpt(bio):
+    """Return the first words of an instructor bio, like ``|truncatewords:50``."""
+    return Truncator(bio or '').words(BIO_EXCERPT_WORDS, truncate=' …')
+
+
+# (model name, source field, stored field, renderer)
+RENDERED_FIELDS = [
+    ('Lesson', 'content', 'content_html', content_html),
+    ('Instructor', 'bio', 'bio_excerpt', bio_excerpt),
+]
+
+# The cached version that pages showing a row are keyed by, and the field
+# holding its id (see courses.cache).
+VERSIONS = {
+    'lesson': (COURSE, 'course_id'),
+    'instructor': (INSTRUCTOR, 'pk'),
+}
+
+
+def rerender(model, source, target, render, batch_size=500, start_pk=None):
+    """
+    Recompute ``model.target`` from ``model.source`` by primary key ranges.
+
+    Each batch is one ``bulk_update`` in its own transaction, and only rows
+    whose stored value differs are written, together with their
+    ``updated_at`` where the model has one. The versions of the courses or
+    instructors the changed rows belong to are bumped so cached pages and
+    ETags pick up the new text. Yields ``(last_pk, updated)`` after every batch.
+    """
+    kind, version_field = VERSIONS[model._meta.model_name]
+    touch = any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+    queryset = model._default_manager.order_by('pk').only(
+        'pk', source, target, *({version_field} - {'pk'})
+    )
+    last_pk = start_pk
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch[:batch_size])
+        if not rows:
+            return
+        changed = []
+        for row in rows:
+            value = render(getattr(row, source))
+            if getattr(row, target) != value:
+                setattr(row, target, value)
+                changed.append(row)
+        if changed:
+            fields = [target]
+            if touch:
+                now = timezone.now()
+                for row in changed:
+                    row.updated_at = now
+                fields.append('updated_at')
+            with transaction.atomic(using=queryset.db):
+                model._default_manager.bulk_update(changed, fields)
+                for pk in {getattr(row, version_field) for row in changed}:
+                    bump_version(kind, pk)
+                bump_version(CATALOG, CATALOG_CONTENTS)
+        last_pk = rows[-1].pk
+        yield last_pk, len(changed)
@@ -0,0 +1,136 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``, the primary. Reads go to one of the
+aliases in ``DATABASE_REPLICAS``, but only while serving a safe request
+(GET, HEAD, OPTIONS) that has not written anything yet:
+
+* Unsafe requests (POST, ...) read from the primary throughout.
+* The first write of a request pins the rest of it to the primary. A
+  write is an INSERT, UPDATE or DELETE actually run on the primary, so
+  ``get_or_create`` that finds its row pins nothing.
+* ``PrimaryReplicaMiddleware`` then sets a short-lived cookie, and for
+  the next ``REPLICA_STICKY_SECONDS`` that client reads from the primary
+  too, so an enrollment is on the page the enroll redirect lands on
+  however far the replicas lag.
+* Management commands, the shell and background threads run outside a
+  request and always use the primary.
+
+Code that reads and then writes based on what it read (in a safe request)
+should read with ``.using('default')`` or call :func:`pin_primary` first.
+No cookie is set when there are no replicas.
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRIMARY = 'default'
+PIN_COOKIE = 'pin_primary'
+
+# Whether reads may go to a replica; only the middleware turns this on.
+_use_replicas = contextvars.ContextVar('use_replicas', default=False)
+_wrote = contextvars.ContextVar('wrote_primary', default=False)
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def pin_primary():
+    """Send the remaining reads of the current request to the primary."""
+    _use_replicas.set(False)
+
+
+def reading_from_replicas():
+    return _use_replicas.get()
+
+
+def _cache_tables():
+    return {
+        config['LOCATION'] for config in settings.CACHES.values()
+        if config['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+    }
+
+
+def _record_writes(execute, sql, params, many, context):
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS) and not any(
+        # The database cache backend writes on every cache miss.
+        table in sql for table in _cache_tables()
+    ):
+        _use_replicas.set(False)
+        _wrote.set(True)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def watch_primary_writes(sender, connection, **kwargs):
+    if connection.alias == PRIMARY and _record_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_writes)
+
+
+class PrimaryReplicaRouter:
+    """Route reads to ``DATABASE_REPLICAS`` and writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or not _use_replicas.get():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+class PrimaryReplicaMiddleware:
+    """Decide per request whether reads may use a replica."""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = self.end(tokens)
+        return self.finish(response, wrote)
+
+    async def _acall(self, request):
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = self.end(tokens)
+        return self.finish(response, wrote)
+
+    def start(self, request):
+        use_replicas = request.method in self.SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+        return _use_replicas.set(use_replicas), _wrote.set(False)
+
+    def end(self, tokens):
+        wrote = _wrote.get()
+        _use_replicas.reset(tokens[0])
+        _wrote.reset(tokens[1])
+        return wrote
+
+    def finish(self, response, wrote):
+        if wrote and getattr(settings, 'DATABASE_REPLICAS', []):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,249 @@
+"""
+Full-text search over courses and lessons.
+
+PostgreSQL keeps a ``search_vector`` tsvector column on the course and
+lesson tables, each with a GIN index. SQLite keeps an FTS5 shadow table,
+``courses_search_fts``, with one row per course and per lesson; course
+rows use ``rowid = 2 * id`` and lesson rows ``rowid = 2 * id + 1`` so
+either can be replaced by rowid without scanning the index. Both are
+created by migration ``0007_search_index``. Other databases fall back to
+unranked ``icontains`` matching.
+
+The index is updated from ``courses.signals`` whenever a Course, Lesson or
+Instructor is saved or deleted; ``manage.py rebuild_search_index``
+reindexes everything in batches.
+"""
+import re
+
+from django.db import connection
+
+from .models import Course, Lesson
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'courses_search_fts'
+
+
+class PostgresSearchBackend:
+    """tsvector columns with GIN indexes, ranked by ``ts_rank``."""
+
+    course_vector = """
+        setweight(to_tsvector(%(config)s, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce(short_description, '')), 'B') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT name FROM courses_instructor WHERE courses_instructor.id = courses_course.instructor_id
+        ), '')), 'B') ||
+        setweight(to_tsvector(%(config)s, coalesce(long_description, '')), 'C')
+    """
+    lesson_vector = """
+        setweight(to_tsvector(%(config)s, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce(content, '')), 'D')
+    """
+
+    def index_courses(self, cursor, ids):
+        cursor.execute(
+            f'UPDATE courses_course SET search_vector = {self.course_vector} WHERE id = ANY(%(ids)s)',
+            {'config': SEARCH_CONFIG, 'ids': list(ids)}
+        )
+
+    def index_lessons(self, cursor, ids):
+        cursor.execute(
+            f'UPDATE courses_lesson SET search_vector = {self.lesson_vector} WHERE id = ANY(%(ids)s)',
+            {'config': SEARCH_CONFIG, 'ids': list(ids)}
+        )
+
+    def remove_courses(self, cursor, ids):
+        pass  # The vector is deleted with its row.
+
+    def remove_lessons(self, cursor, ids):
+        pass
+
+    def search(self, cursor, table, query, limit):
+        cursor.execute(
+            f"""
+            SELECT id, ts_rank(search_vector, query) AS rank
+            FROM {table}, websearch_to_tsquery(%s, %s) AS query
+            WHERE search_vector @@ query
+            ORDER BY rank DESC, id DESC
+            LIMIT %s
+            """,
+            [SEARCH_CONFIG, query, limit]
+        )
+        return cursor.fetchall()
+
+    def search_courses(self, cursor, query, limit):
+        return self.search(cursor, 'courses_course', query, limit)
+
+    def search_lessons(self, cursor, query, limit):
+        return self.search(cursor, 'courses_lesson', query, limit)
+
+
+class SqliteSearchBackend:
+    """An FTS5 shadow table ranked by ``bm25``."""
+
+    # bm25 weights for kind, course_id, title, body, instructor.
+    weights = '0, 0, 10.0, 2.0, 5.0'
+
+    def _placeholders(self, ids):
+        return ', '.join(['%s'] * len(ids))
+
+    def index_courses(self, cursor, ids):
+        self.remove_courses(cursor, ids)
+        cursor.execute(
+            f"""
+            INSERT INTO {FTS_TABLE} (rowid, kind, course_id, title, body, instructor)
+            SELECT c.id * 2, 'course', c.id, c.title,
+                   c.short_description || ' ' || c.long_description, coalesce(i.name, '')
+            FROM courses_course c LEFT JOIN courses_instructor i ON i.id = c.instructor_id
+            WHERE c.id IN ({self._placeholders(ids)})
+            """,
+            list(ids)
+        )
+
+    def index_lessons(self, cursor, ids):
+        self.remove_lessons(cursor, ids)
+        cursor.execute(
+            f"""
+            INSERT INTO {FTS_TABLE} (rowid, kind, course_id, title, body, instructor)
+            SELECT id * 2 + 1, 'lesson', course_id, title, content, ''
+            FROM courses_lesson
+            WHERE id IN ({self._placeholders(ids)})
+            """,
+            list(ids)
+        )
+
+    def remove_courses(self, cursor, ids):
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({self._placeholders(ids)})',
+            [pk * 2 for pk in ids]
+        )
+
+    def remove_lessons(self, cursor, ids):
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({self._placeholders(ids)})',
+            [pk * 2 + 1 for pk in ids]
+        )
+
+    def match_expression(self, query):
+        """Quote every word so user input can never be read as FTS5 syntax."""
+        terms = re.findall(r'\w+', query)
+        return ' '.join('"%s"' % term for term in terms)
+
+    def search(self, cursor, kind, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        cursor.execute(
+            f"""
+            SELECT rowid / 2, bm25({FTS_TABLE}, {self.weights}) AS rank
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s AND kind = %s
+            ORDER BY rank
+            LIMIT %s
+            """,
+            [expression, kind, limit]
+        )
+        # bm25 is lower-is-better; flip it so every backend ranks high-is-better.
+        return [(pk, -rank) for pk, rank in cursor.fetchall()]
+
+    def search_courses(self, cursor, query, limit):
+        return self.search(cursor, 'course', query, limit)
+
+    def search_lessons(self, cursor, query, limit):
+        return self.search(cursor, 'lesson', query, limit)
+
+
+class FallbackSearchBackend:
+    """Unindexed, unranked ``icontains`` matching for other databases."""
+
+    def index_courses(self, cursor, ids):
+        pass
+
+    index_lessons = remove_courses = remove_lessons = index_courses
+
+    def search_courses(self, cursor, query, limit):
+        courses = Course.objects.filter(title__icontains=query) | Course.objects.filter(
+            short_description__icontains=query
+        ) | Course.objects.filter(instructor__name__icontains=query)
+        return [(pk, 0) for pk in courses.values_list('pk', flat=True)[:limit]]
+
+    def search_lessons(self, cursor, query, limit):
+        lessons = Lesson.objects.filter(title__icontains=query) | Lesson.objects.filter(
+            content__icontains=query
+        )
+        return [(pk, 0) for pk in lessons.values_list('pk', flat=True)[:limit]]
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+
+def _run(method, ids):
+    ids = list(ids)
+    if ids:
+        with connection.cursor() as cursor:
+            getattr(get_backend(), method)(cursor, ids)
+
+
+def index_courses(ids):
+    """(Re)index the given courses."""
+    _run('index_courses', ids)
+
+
+def index_lessons(ids):
+    """(Re)index the given lessons."""
+    _run('index_lessons', ids)
+
+
+def remove_courses(ids):
+    """Drop the given courses from the index."""
+    _run('remove_courses', ids)
+
+
+def remove_lessons(ids):
+    """Drop the given lessons from the index."""
+    _run('remove_lessons', ids)
+
+
+def _ranked(queryset, hits):
+    objects = queryset.in_bulk([pk for pk, _ in hits])
+    results = []
+    for pk, rank in hits:
+        if pk in objects:
+            objects[pk].search_rank = rank
+            results.append(objects[pk])
+    return results
+
+
+def search_courses(query, limit=20):
+    """Return courses matching ``query``, best match first."""
+    with connection.cursor() as cursor:
+        hits = get_backend().search_courses(cursor, query, limit)
+    return _ranked(Course.objects.select_related('instructor'), hits)
+
+
+def search_lessons(query, limit=20):
+    """Return lessons matching ``query``, best match first."""
+    with connection.cursor() as cursor:
+        hits = get_backend().search_lessons(cursor, query, limit)
+    return _ranked(Lesson.objects.select_related('course'), hits)
+
+
+def rebuild(batch_size=500):
+    """Reindex every course and lesson; yields ``(model, indexed)`` per batch."""
+    for model, method in ((Course, 'index_courses'), (Lesson, 'index_lessons')):
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            _run(method, pks)
+            last_pk = pks[-1]
+            yield model, len(pks)
@@ -0,0 +1,259 @@
+"""
+Signal handlers that keep derived data in step with writes: the
+denormalized counters, the full-text search index, the fragment
+cache versions and the write metrics.
+
+Every counter update is a single ``UPDATE ... SET n = n + 1`` built from
+F() expressions, so concurrent writers never lose increments and the
+change commits or rolls back with the row that caused it.
+
+Enrollments and lesson progress, the largest tables, have no delete
+receivers, so Django deletes their rows in bulk when a course, lesson or
+user goes. Direct deletes send ``rows_deleted`` instead, and cascades are
+recounted with one set-based update from the lesson and user receivers;
+lessons removed by one delete are recounted together once it commits.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import metrics, search
+from .cache import (
+    CATALOG, CATALOG_CONTENTS, CATALOG_MEMBERS, COURSE, INSTRUCTOR, PROGRESS, bump_version,
+)
+from .counters import enrollment_count_expression, refresh_completed_lessons
+from .models import Course, Enrollment, Instructor, Lesson, LessonProgress, rows_deleted
+
+
+def _increment(queryset, field):
+    queryset.update(**{field: F(field) + 1})
+
+
+def _decrement(queryset, field):
+    queryset.update(**{field: Greatest(F(field) - 1, 0)})
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_instructor(sender, instance, raw=False, **kwargs):
+    """Stash the stored instructor so post_save can tell if it changed."""
+    if raw or instance._state.adding:
+        instance._previous_instructor_id = None
+        return
+    instance._previous_instructor_id = Course.objects.filter(
+        pk=instance.pk
+    ).values_list('instructor_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_instructor_id', None)
+    if not created and previous == instance.instructor_id:
+        return
+    if previous:
+        _decrement(Instructor.objects.filter(pk=previous), 'course_count')
+    if instance.instructor_id:
+        _increment(Instructor.objects.filter(pk=instance.instructor_id), 'course_count')
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    if instance.instructor_id:
+        _decrement(Instructor.objects.filter(pk=instance.instructor_id), 'course_count')
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, raw=False, **kwargs):
+    """Stash the stored course so post_save can tell if the lesson moved."""
+    if raw or instance._state.adding:
+        instance._previous_course_id = None
+        return
+    instance._previous_course_id = Lesson.objects.filter(
+        pk=instance.pk
+    ).values_list('course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_previous_course_id', None)
+    if not created and previous == instance.course_id:
+        return
+    if previous:
+        _decrement(Course.objects.filter(pk=previous), 'lesson_count')
+        # Progress rows carry a copy of the lesson's course.
+        LessonProgress.objects.filter(lesson=instance).update(course_id=instance.course_id)
+        refresh_completed_lessons(Enrollment.objects.filter(course_id__in=[previous, instance.course_id]))
+    _increment(Course.objects.filter(pk=instance.course_id), 'lesson_count')
+
+
+def _deletes_course(origin):
+    """Whether the delete that started at ``origin`` removes courses, and their enrollments with them."""
+    return isinstance(origin, Course) or getattr(origin, 'model', None) is Course
+
+
+def _recount_after(origin, course_id):
+    """Recount the course's enrollments once the delete started at ``origin`` commits."""
+    course_ids = getattr(origin, '_recount_course_ids', None)
+    if course_ids is None:
+        course_ids = {course_id}
+        if origin is not None:
+            origin._recount_course_ids = course_ids
+        transaction.on_commit(
+            lambda: refresh_completed_lessons(Enrollment.objects.filter(course_id__in=course_ids))
+        )
+    course_ids.add(course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, origin=None, **kwargs):
+    _decrement(Course.objects.filter(pk=instance.course_id), 'lesson_count')
+    if not _deletes_course(origin):
+        # The lesson's progress rows went with it.
+        _recount_after(origin, instance.course_id)
+
+
+@receiver(pre_save, sender=Enrollment)
+def count_existing_progress(sender, instance, raw=False, **kwargs):
+    """A new enrollment starts with whatever progress the user already has."""
+    if raw or not instance._state.adding:
+        return
+    instance.completed_lessons = LessonProgress.objects.filter(
+        user_id=instance.user_id,
+        course_id=instance.course_id
+    ).count()
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _increment(Course.objects.filter(pk=instance.course_id), 'enrollment_count')
+        metrics.record_enrollment()
+
+
+def _recount_enrollments(course_ids):
+    Course.objects.filter(pk__in=course_ids).update(enrollment_count=enrollment_count_expression())
+
+
+@receiver(pre_delete, sender=User)
+def remember_user_courses(sender, instance, **kwargs):
+    """Stash the user's courses; their enrollments are deleted in bulk with them."""
+    instance._enrolled_course_ids = list(
+        Enrollment.objects.filter(user=instance).values_list('course_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_enrolled_course_ids', None):
+        _recount_enrollments(instance._enrolled_course_ids)
+
+
+def _enrollment_for_progress(progress):
+    if progress.course_id is None:
+        # Not yet backfilled; fall back to the lesson's course.
+        return Enrollment.objects.filter(user_id=progress.user_id, course__lessons=progress.lesson_id)
+    return Enrollment.objects.filter(user_id=progress.user_id, course_id=progress.course_id)
+
+
+@receiver(post_save, sender=LessonProgress)
+def progress_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _increment(_enrollment_for_progress(instance), 'completed_lessons')
+        metrics.record_progress_written(1, 'direct')
+
+
+@receiver(rows_deleted, sender=Enrollment)
+def enrollments_deleted(sender, keys, **kwargs):
+    _recount_enrollments({course_id for _, course_id in keys})
+
+
+@receiver(rows_deleted, sender=LessonProgress)
+def progress_deleted(sender, keys, **kwargs):
+    refresh_completed_lessons(Enrollment.objects.filter(
+        user_id__in={user_id for user_id, _ in keys},
+        course_id__in={course_id for _, course_id in keys},
+    ))
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_courses([instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_courses([instance.pk])
+
+
+@receiver(post_save, sender=Lesson)
+def index_lesson(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_lessons([instance.pk])
+
+
+@receiver(post_delete, sender=Lesson)
+def unindex_lesson(sender, instance, **kwargs):
+    search.remove_lessons([instance.pk])
+
+
+@receiver(post_save, sender=Instructor)
+def reindex_instructor_courses(sender, instance, created, raw=False, **kwargs):
+    """Course documents include the instructor's name."""
+    if not created and not raw:
+        search.index_courses(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_fragments(sender, instance, raw=False, created=False, signal=None, **kwargs):
+    if raw:
+        return
+    bump_version(COURSE, instance.pk)
+    bump_version(CATALOG, CATALOG_CONTENTS)
+    previous = getattr(instance, '_previous_instructor_id', None)
+    if created or signal is post_delete or previous != instance.instructor_id:
+        # The course joined or left the catalog, or an instructor's course list.
+        bump_version(CATALOG, CATALOG_MEMBERS)
+        bump_version(INSTRUCTOR, previous)
+        bump_version(INSTRUCTOR, instance.instructor_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_fragments(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_version(COURSE, instance.course_id)
+    bump_version(CATALOG, CATALOG_CONTENTS)
+    previous = getattr(instance, '_previous_course_id', None)
+    if previous and previous != instance.course_id:
+        bump_version(COURSE, previous)
+
+
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+def invalidate_instructor_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(INSTRUCTOR, instance.pk)
+        bump_version(CATALOG, CATALOG_CONTENTS)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=LessonProgress)
+def invalidate_user_progress(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(PROGRESS, instance.user_id)
+
+
+@receiver(rows_deleted, sender=Enrollment)
+@receiver(rows_deleted, sender=LessonProgress)
+def invalidate_deleted_progress(sender, keys, **kwargs):
+    for user_id in {user_id for user_id, _ in keys}:
+        bump_version(PROGRESS, user_id)
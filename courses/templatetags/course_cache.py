@@ -0,0 +1,75 @@
+"""
+Template tags for versioned fragment caching.
+
+``{% fragment_cache name vary_on... %}...{% endfragment_cache %}`` caches
+the enclosed markup under a key built from ``name`` and the ``vary_on``
+values; pass the object's ``cache_version`` as one of them so edits
+invalidate the fragment.
+
+Per-user markup must never be cached. Mark its place inside a fragment
+with ``{% fragment_hole 'template.html' key=value %}``: the fragment is
+cached with a placeholder, and on every request the placeholder is
+replaced by ``template.html`` rendered against the current context plus
+the given keyword arguments.
+"""
+import json
+import re
+
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+
+from courses.cache import fragment_timeout, record_fragment_lookup
+
+register = template.Library()
+
+HOLE_PATTERN = re.compile(r'<!--fragment-hole:(.*?)-->')
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, name, vary_on, nodelist):
+        self.name = name
+        self.vary_on = vary_on
+        self.nodelist = nodelist
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.name.resolve(context),
+            [var.resolve(context) for var in self.vary_on]
+        )
+        html = cache.get(key)
+        record_fragment_lookup(hit=html is not None)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, fragment_timeout())
+        return HOLE_PATTERN.sub(lambda match: self.fill_hole(match, context), html)
+
+    def fill_hole(self, match, context):
+        hole = json.loads(match.group(1))
+        hole_template = context.template.engine.get_template(hole['template'])
+        with context.push(**hole['context']):
+            return hole_template.render(context)
+
+
+@register.tag
+def fragment_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least a fragment name.")
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+        nodelist,
+    )
+
+
+@register.simple_tag
+def fragment_hole(template_name, **kwargs):
+    """Placeholder for per-request markup inside a cached fragment."""
+    payload = json.dumps({'template': template_name, 'context': kwargs})
+    # Keep the payload from closing the HTML comment early.
+    payload = payload.replace('>', '\\u003e')
+    return mark_safe(f'<!--fragment-hole:{payload}-->')
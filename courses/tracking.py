@@ -0,0 +1,224 @@
+"""
+Recording lesson views.
+
+By default every view is written straight away with ``get_or_create``.
+With ``LESSON_PROGRESS_WRITE_BEHIND`` enabled, views are collected in a
+bounded per-process buffer instead and written with one
+``bulk_create(ignore_conflicts=True)`` when the buffer reaches
+``LESSON_PROGRESS_BUFFER_SIZE`` entries, when ``LESSON_PROGRESS_FLUSH_INTERVAL``
+seconds have passed, or when the process exits.
+
+Until a view is flushed it is also remembered in the cache under a key
+of its own, numbered with ``cache.incr`` on a per-learner counter, so
+workers recording views for the same learner never overwrite each other.
+:func:`pending_lesson_ids` and ``courses.progress`` read those keys back
+and merge them into the viewed set, the next lesson and the completed
+count, so the learner's next page already shows the lesson as viewed. The
+stored counters (``Enrollment.completed_lessons``) catch up at the flush.
+The next page may be served by another worker, so write-behind needs a
+cache shared between workers (``CACHE_SHARED``).
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from . import metrics
+from .cache import PROGRESS, bump_version
+from .counters import refresh_completed_lessons
+from .models import Enrollment, LessonProgress
+
+logger = logging.getLogger(__name__)
+
+
+def _pending_key(user_id, slot=None):
+    if slot is None:
+        return f'progress:pending:{user_id}:slots'
+    return f'progress:pending:{user_id}:{slot}'
+
+
+class LessonViewBuffer:
+    """A bounded, thread-safe buffer of unsaved ``(user, lesson)`` views."""
+
+    def __init__(self, max_size, flush_interval):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries = {}
+        # Cache keys of the pending views this process has recorded.
+        self._slots = {}
+        self._last_flush = time.monotonic()
+        self._flusher_pid = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, user_id, lesson_id, course_id):
+        key = self._remember_pending(user_id, lesson_id, course_id)
+        with self._lock:
+            self._entries[(user_id, lesson_id)] = course_id
+            self._slots.setdefault((user_id, lesson_id), []).append(key)
+            due = (
+                len(self._entries) >= self.max_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        bump_version(PROGRESS, user_id)
+        self._ensure_flusher()
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                pass  # Already logged; the view stays queued and is still shown as pending.
+
+    def flush(self):
+        """Write every buffered view; returns the number of views written."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, {}
+                self._last_flush = time.monotonic()
+            if not entries:
+                return 0
+            try:
+                self._write(entries)
+            except Exception:
+                logger.exception('Failed to flush %d lesson views; requeueing', len(entries))
+                self._requeue(entries)
+                raise
+            self._forget_pending(entries)
+            return len(entries)
+
+    def _requeue(self, entries):
+        # Stay bounded while the database is unavailable: keep at most twice
+        # the flush size and drop the oldest views beyond that.
+        with self._lock:
+            merged = dict(entries)
+            merged.update(self._entries)
+            overflow = len(merged) - self.max_size * 2
+            if overflow > 0:
+                logger.error('Lesson view buffer full; dropping %d views', overflow)
+                merged = dict(list(merged.items())[overflow:])
+            self._entries = merged
+
+    def _write(self, entries):
+        write_lesson_views(entries, 'write_behind')
+
+    def _remember_pending(self, user_id, lesson_id, course_id):
+        """Store the view in a new slot of its own and return the slot's key."""
+        timeout = max(self.flush_interval * 10, 60)
+        counter = _pending_key(user_id)
+        cache.add(counter, 0, timeout=timeout)
+        try:
+            slot = cache.incr(counter)
+        except ValueError:
+            # The counter expired in between; start a new one.
+            cache.add(counter, 0, timeout=timeout)
+            slot = cache.incr(counter)
+        # Slots are read up to the counter, so it lives as long as they do.
+        cache.touch(counter, timeout=timeout)
+        key = _pending_key(user_id, slot)
+        cache.set(key, (lesson_id, course_id), timeout=timeout)
+        return key
+
+    def _forget_pending(self, entries):
+        with self._lock:
+            keys = [key for entry in entries for key in self._slots.pop(entry, [])]
+        cache.delete_many(keys)
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so each worker starts its own.
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='lesson-view-flusher', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not self._entries:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                pass  # Already logged; the entries stay queued for the next attempt.
+            finally:
+                connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return this process's buffer, creating it on first use."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LessonViewBuffer(
+                    max_size=getattr(settings, 'LESSON_PROGRESS_BUFFER_SIZE', 500),
+                    flush_interval=getattr(settings, 'LESSON_PROGRESS_FLUSH_INTERVAL', 5),
+                )
+    return _buffer
+
+
+def flush():
+    """Flush buffered views, if any; safe to call from shutdown hooks."""
+    if _buffer is not None:
+        return _buffer.flush()
+    return 0
+
+
+atexit.register(flush)
+
+
+def write_lesson_views(entries, mode):
+    """
+    Write ``{(user_id, lesson_id): course_id}`` views with one bulk insert,
+    skipping views already recorded, and bring the learners' counters up
+    to date. ``mode`` labels the write in the metrics.
+    """
+    with transaction.atomic():
+        LessonProgress.objects.bulk_create(
+            [
+                LessonProgress(user_id=user_id, lesson_id=lesson_id, course_id=course_id)
+                for (user_id, lesson_id), course_id in entries.items()
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        # bulk_create skips the post_save counter handlers.
+        refresh_completed_lessons(Enrollment.objects.filter(
+            user_id__in={user_id for user_id, _ in entries},
+            course_id__in=set(entries.values()),
+        ))
+        metrics.record_progress_written(len(entries), mode)
+        for user_id in {user_id for user_id, _ in entries}:
+            bump_version(PROGRESS, user_id)
+
+
+def record_lesson_view(user, lesson):
+    """Record that ``user`` has viewed ``lesson``."""
+    if getattr(settings, 'LESSON_PROGRESS_WRITE_BEHIND', False):
+        get_buffer().add(user.pk, lesson.pk, lesson.course_id)
+    else:
+        LessonProgress.objects.get_or_create(user=user, lesson=lesson)
+
+
+def pending_views(user):
+    """Return ``{lesson_id: course_id}`` for the user's views that are not yet flushed."""
+    if not getattr(settings, 'LESSON_PROGRESS_WRITE_BEHIND', False):
+        return {}
+    slots = cache.get(_pending_key(user.pk)) or 0
+    return dict(cache.get_many([_pending_key(user.pk, slot) for slot in range(1, slots + 1)]).values())
+
+
+def pending_lesson_ids(user, course):
+    """Return ids of lessons in ``course`` the user viewed that are not yet flushed."""
+    return {lesson_id for lesson_id, course_id in pending_views(user).items() if course_id == course.pk}
@@ -1,10 +1,26 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# The catalog and progress pages, async under ASGI when ASYNC_VIEWS is set.
+pages = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('', views.course_list, name='course_list'),
-    path('course/<int:pk>/', views.course_detail, name='course_detail'),
+    path('', pages.course_list, name='course_list'),
+    path('search/', views.search, name='search'),
+    path('course/<int:pk>/', pages.course_detail, name='course_detail'),
     path('course/<int:pk>/enroll/', views.enroll_course, name='enroll_course'),
-    path('course/<int:course_pk>/lesson/<int:lesson_pk>/', views.lesson_detail, name='lesson_detail'),
-    path('my-courses/', views.my_courses, name='my_courses'),
+    path('course/<int:course_pk>/lesson/<int:lesson_pk>/', pages.lesson_detail, name='lesson_detail'),
+    path('my-courses/', pages.my_courses, name='my_courses'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('metrics', views.metrics, name='metrics'),
+    path('exports/<slug:dataset>.<slug:fmt>', views.export_data, name='export_data'),
+    path('api/v1/courses/', api.course_list, name='api_course_list'),
+    path('api/v1/courses/<int:pk>/', api.course_detail, name='api_course_detail'),
+    path('api/v1/courses/<int:pk>/lessons/', api.lesson_list, name='api_lesson_list'),
+    path('api/v1/lessons/<int:pk>/', api.lesson_detail, name='api_lesson_detail'),
+    path('api/v1/instructors/', api.instructor_list, name='api_instructor_list'),
+    path('api/v1/instructors/<int:pk>/', api.instructor_detail, name='api_instructor_detail'),
+    path('api/v1/me/enrollments/', api.my_enrollments, name='api_my_enrollments'),
+    path('api/v1/me/progress/', api.my_progress, name='api_my_progress'),
 ]
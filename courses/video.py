@@ -0,0 +1,127 @@
+"""
+YouTube URL parsing.
+
+Lessons store the video id and embed URL parsed from ``youtube_url`` when
+they are saved (see ``Lesson.save``), so pages never parse URLs while
+rendering. :func:`backfill_video_columns` fills them in for rows saved
+before the columns existed.
+"""
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import COURSE, bump_version
+
+VIDEO_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+TIMESTAMP = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+EMBED_BASE = 'https://www.youtube.com/embed/'
+
+# Paths whose second segment is the video id, e.g. /shorts/<id>.
+ID_PATHS = {'embed', 'shorts', 'live', 'v', 'e'}
+
+
+def _is_youtube_host(host):
+    host = host.lower().split(':')[0]
+    return host in ('youtube.com', 'youtube-nocookie.com') or host.endswith(
+        ('.youtube.com', '.youtube-nocookie.com')
+    )
+
+
+def _seconds(value):
+    """Return ``90``, ``90s`` or ``1m30s`` as seconds, or None."""
+    match = TIMESTAMP.match(value or '')
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_youtube_url(url):
+    """
+    Return ``(video_id, start_seconds)`` for a YouTube URL, or
+    ``(None, None)`` if ``url`` is not one. Handles watch, short-link,
+    embed, shorts and live URLs on any YouTube host, and ``t`` or
+    ``start`` timestamps in the query string or fragment.
+    """
+    try:
+        parts = urlsplit((url or '').strip())
+    except ValueError:
+        return None, None
+    if not parts.netloc and parts.path.startswith(('youtube.com/', 'www.youtube.com/', 'youtu.be/')):
+        parts = urlsplit('https://' + url.strip())
+    host = parts.netloc.lower().split(':')[0]
+    query = parse_qs(parts.query)
+    segments = [segment for segment in parts.path.split('/') if segment]
+
+    video_id = None
+    if host in ('youtu.be', 'www.youtu.be'):
+        video_id = segments[0] if segments else None
+    elif _is_youtube_host(host):
+        if segments[:1] == ['watch']:
+            video_id = query.get('v', [None])[0]
+        elif len(segments) >= 2 and segments[0] in ID_PATHS:
+            video_id = segments[1]
+    if not video_id or not VIDEO_ID.match(video_id):
+        return None, None
+
+    fragment = parse_qs(parts.fragment)
+    for params in (query, fragment):
+        for name in ('t', 'start'):
+            if name in params:
+                return video_id, _seconds(params[name][0])
+    return video_id, None
+
+
+def embed_url(video_id, start=None):
+    """Return the canonical embed URL for ``video_id``."""
+    if not video_id:
+        return ''
+    url = EMBED_BASE + video_id
+    return f'{url}?start={start}' if start else url
+
+
+def video_columns(url):
+    """Return the ``youtube_video_id`` and ``youtube_embed_url`` values for ``url``."""
+    video_id, start = parse_youtube_url(url)
+    return {'youtube_video_id': video_id or '', 'youtube_embed_url': embed_url(video_id, start)}
+
+
+def backfill_video_columns(model, batch_size=1000, start_pk=None):
+    """
+    Recompute the video columns of ``model`` (the Lesson model) by
+    primary key ranges.
+
+    Each batch is one ``bulk_update`` in its own transaction, and only rows
+    whose stored values differ are written, with a new ``updated_at``; the
+    versions of their courses are bumped so cached lesson pages and ETags
+    show the new embed. Yields ``(last_pk, updated)`` after every batch.
+    """
+    queryset = model._default_manager.order_by('pk').only(
+        'pk', 'course', 'youtube_url', 'youtube_video_id', 'youtube_embed_url'
+    )
+    last_pk = start_pk
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        lessons = list(batch[:batch_size])
+        if not lessons:
+            return
+        changed = []
+        now = timezone.now()
+        for lesson in lessons:
+            columns = video_columns(lesson.youtube_url)
+            if any(getattr(lesson, name) != value for name, value in columns.items()):
+                for name, value in columns.items():
+                    setattr(lesson, name, value)
+                lesson.updated_at = now
+                changed.append(lesson)
+        if changed:
+            with transaction.atomic(using=queryset.db):
+                model._default_manager.bulk_update(
+                    changed, ['youtube_video_id', 'youtube_embed_url', 'updated_at']
+                )
+                for course_id in {lesson.course_id for lesson in changed}:
+                    bump_version(COURSE, course_id)
+        last_pk = lessons[-1].pk
+        yield last_pk, len(changed)
@@ -1,54 +1,103 @@
+import hmac
+
+from django.conf import settings
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Course, Lesson, Enrollment, LessonProgress
+from .models import Course, Lesson, Enrollment
+from . import export
+from . import metrics as prometheus_metrics
+from . import search as search_index
+from .cache import CATALOG_MEMBERS, attach_cache_versions, catalog_version, fragment_stats
+from .conditional import conditional_course_detail, conditional_course_list, conditional_lesson_detail
+from .page_cache import cache_anonymous_page
+from .pagination import InvalidCursor, KeysetPaginator
+from .progress import enrollment_progress, enrollment_progress_by_course, viewed_lesson_ids
+from .tracking import record_lesson_view
+
+
+COURSES_PER_PAGE = 20
+
+
+def course_card_queryset():
+    """Return courses with everything a catalog card renders, in one query."""
+    return Course.objects.select_related('instructor').defer('long_description')
+
+
+# The query parameters catalog_page reads.
+CATALOG_PARAMS = ('after', 'before')
+
+
+def catalog_page(request):
+    """Return the requested page of course cards, with their cache versions."""
+    # Pages shift when a course is added or removed.
+    catalog_version(CATALOG_MEMBERS)
+    paginator = KeysetPaginator(course_card_queryset(), COURSES_PER_PAGE, Course._meta.ordering)
+    try:
+        page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        raise Http404('Invalid page cursor.')
+    attach_cache_versions(page.object_list)
+    return page
+
+
+def other_courses_by(course, limit=4):
+    """Return up to ``limit`` other courses by ``course``'s instructor."""
+    return attach_cache_versions(Course.objects.filter(
+        instructor_id=course.instructor_id
+    ).exclude(pk=course.pk)[:limit])
 
 
+@cache_anonymous_page(params=CATALOG_PARAMS)
+@conditional_course_list
 def course_list(request):
-    """Display all available courses."""
-    courses = Course.objects.all()
+    """Display available courses, one keyset-paginated page at a time."""
+    page = catalog_page(request)
 
     enrolled_courses_data = {}
-    if request.user.is_authenticated:
-        enrollments = Enrollment.objects.filter(user=request.user).select_related('course')
-
-        for enrollment in enrollments:
-            course = enrollment.course
-            all_lessons = list(course.lessons.all())
-
-            completed_lesson_ids = set(
-                LessonProgress.objects.filter(
-                    user=request.user,
-                    lesson__course=course
-                ).values_list('lesson_id', flat=True)
-            )
-
-            # Find next uncompleted lesson
-            next_lesson = None
-            for lesson in all_lessons:
-                if lesson.id not in completed_lesson_ids:
-                    next_lesson = lesson
-                    break
-
-            # If all completed, use first lesson for review
-            if next_lesson is None and all_lessons:
-                next_lesson = all_lessons[0]
-
-            enrolled_courses_data[course.id] = {
-                'next_lesson': next_lesson,
-                'completed': len(completed_lesson_ids),
-                'total': len(all_lessons),
-            }
+    if request.user.is_authenticated and page.object_list:
+        enrolled_courses_data = enrollment_progress_by_course(
+            request.user,
+            course_ids=[course.pk for course in page]
+        )
 
     return render(request, 'courses/course_list.html', {
-        'courses': courses,
+        'courses': page.object_list,
+        'page': page,
         'enrolled_courses_data': enrolled_courses_data,
     })
 
 
+SEARCH_RESULTS_LIMIT = 20
+
+
+def search(request):
+    """Display courses and lessons matching the ``q`` query, best match first."""
+    query = request.GET.get('q', '').strip()
+    courses = []
+    lessons = []
+    if query:
+        courses = search_index.search_courses(query, limit=SEARCH_RESULTS_LIMIT)
+        lessons = search_index.search_lessons(query, limit=SEARCH_RESULTS_LIMIT)
+
+    return render(request, 'courses/search.html', {
+        'query': query,
+        'courses': courses,
+        'lessons': lessons,
+    })
+
+
+@cache_anonymous_page
+@conditional_course_detail
 def course_detail(request, pk):
     """Display course details and its lessons."""
-    course = get_object_or_404(Course, pk=pk)
+    course = get_object_or_404(Course.objects.select_related('instructor'), pk=pk)
+    attach_cache_versions([course])
     lessons = course.lessons.all()
 
     is_enrolled = False
@@ -61,19 +110,12 @@ def course_detail(request, pk):
         ).exists()
 
         if is_enrolled:
-            viewed_lessons = set(
-                LessonProgress.objects.filter(
-                    user=request.user,
-                    lesson__course=course
-                ).values_list('lesson_id', flat=True)
-            )
+            viewed_lessons = viewed_lesson_ids(request.user, course)
 
     # Get other courses by the same instructor
     other_courses = []
     if course.instructor:
-        other_courses = Course.objects.filter(
-            instructor=course.instructor
-        ).exclude(pk=course.pk)[:4]
+        other_courses = other_courses_by(course)
 
     context = {
         'course': course,
@@ -106,52 +148,19 @@ def enroll_course(request, pk):
 @login_required
 def my_courses(request):
     """Display courses the current user is enrolled in."""
-    enrollments = Enrollment.objects.filter(user=request.user).select_related('course')
-
-    # Calculate progress for each enrollment
-    courses_with_progress = []
-    for enrollment in enrollments:
-        course = enrollment.course
-        all_lessons = list(course.lessons.all())
-        total_lessons = len(all_lessons)
-
-        completed_lesson_ids = set(
-            LessonProgress.objects.filter(
-                user=request.user,
-                lesson__course=course
-            ).values_list('lesson_id', flat=True)
-        )
-        completed_lessons = len(completed_lesson_ids)
-
-        progress_percent = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
-
-        # Find next uncompleted lesson
-        next_lesson = None
-        for lesson in all_lessons:
-            if lesson.id not in completed_lesson_ids:
-                next_lesson = lesson
-                break
-
-        # If all completed, use first lesson for review
-        if next_lesson is None and all_lessons:
-            next_lesson = all_lessons[0]
-
-        courses_with_progress.append({
-            'enrollment': enrollment,
-            'total_lessons': total_lessons,
-            'completed_lessons': completed_lessons,
-            'progress_percent': round(progress_percent),
-            'next_lesson': next_lesson,
-        })
+    courses_with_progress = enrollment_progress(request.user)
 
     return render(request, 'courses/my_courses.html', {'courses': courses_with_progress})
 
 
 @login_required
+@conditional_lesson_detail
 def lesson_detail(request, course_pk, lesson_pk):
     """Display lesson details and track progress."""
     course = get_object_or_404(Course, pk=course_pk)
-    lesson = get_object_or_404(Lesson, pk=lesson_pk, course=course)
+    attach_cache_versions([course])
+    # The page shows the stored content_html, not the source text.
+    lesson = get_object_or_404(Lesson.objects.defer('content'), pk=lesson_pk, course=course)
 
     # Check if user is enrolled
     is_enrolled = Enrollment.objects.filter(
@@ -164,28 +173,16 @@ def lesson_detail(request, course_pk, lesson_pk):
         return redirect('course_detail', pk=course_pk)
 
     # Track lesson progress
-    LessonProgress.objects.get_or_create(
-        user=request.user,
-        lesson=lesson
-    )
-
-    # Get all lessons for navigation
-    all_lessons = list(course.lessons.all())
-    current_index = next(
-        (i for i, l in enumerate(all_lessons) if l.pk == lesson.pk),
-        0
-    )
+    record_lesson_view(request.user, lesson)
 
-    prev_lesson = all_lessons[current_index - 1] if current_index > 0 else None
-    next_lesson = all_lessons[current_index + 1] if current_index < len(all_lessons) - 1 else None
+    # Neighbours come from index lookups on (course, order); the sidebar
+    # list is only fetched when its cached fragment has expired.
+    prev_lesson = lesson.get_previous_lesson()
+    next_lesson = lesson.get_next_lesson()
+    all_lessons = course.lessons.only('id', 'course', 'title', 'order')
 
     # Get viewed lessons for progress tracking
-    viewed_lessons = set(
-        LessonProgress.objects.filter(
-            user=request.user,
-            lesson__course=course
-        ).values_list('lesson_id', flat=True)
-    )
+    viewed_lessons = viewed_lesson_ids(request.user, course)
 
     context = {
         'course': course,
@@ -196,3 +193,48 @@ def lesson_detail(request, course_pk, lesson_pk):
         'next_lesson': next_lesson,
     }
     return render(request, 'courses/lesson_detail.html', context)
+
+
+@staff_member_required
+def cache_stats(request):
+    """Report this worker's fragment cache hit and miss counts."""
+    return JsonResponse({'fragments': fragment_stats()})
+
+
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+@staff_member_required
+def export_data(request, dataset, fmt):
+    """
+    Stream enrollments or lesson progress as CSV or NDJSON, filtered by
+    ``course`` (repeatable), ``since`` and ``until`` and resumed ``after`` an id.
+    """
+    try:
+        lines = export.stream(
+            dataset, fmt,
+            courses=[int(pk) for pk in request.GET.getlist('course')],
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+            after=int(request.GET['after']) if request.GET.get('after') else None,
+        )
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
+
+
+def metrics(request):
+    """
+    Serve Prometheus metrics to scrapers that send ``METRICS_TOKEN``; without
+    a token they are only served with ``DEBUG`` on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    body, content_type = prometheus_metrics.render()
+    return HttpResponse(body, content_type=content_type)
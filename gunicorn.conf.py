@@ -0,0 +1,139 @@
+"""
+gunicorn settings for production; gunicorn reads this file from the
+working directory, so ``gunicorn`` alone starts the site.
+
+Sizing (all optional):
+
+* ``GUNICORN_WORKER_CLASS``: ``gthread`` (default) or
+  ``uvicorn_worker.UvicornWorker``, which serves the ASGI application
+  with ``ASYNC_VIEWS`` on.
+* ``WEB_CONCURRENCY``: worker processes; ``2 * CPUs + 1`` for threaded
+  workers and one per CPU for uvicorn, at most ``GUNICORN_MAX_WORKERS``
+  (12). CPUs are those this process may run on.
+* ``GUNICORN_THREADS``: threads per threaded worker (2). Each thread
+  keeps its own database connection, so the site holds up to
+  ``workers * threads`` connections per replica.
+* ``GUNICORN_MAX_REQUESTS`` (1000) and ``GUNICORN_MAX_REQUESTS_JITTER``
+  (a tenth of it): recycle workers to bound memory growth.
+* ``GUNICORN_PRELOAD`` (true), ``GUNICORN_TIMEOUT`` (30),
+  ``GUNICORN_KEEPALIVE`` (5), ``GUNICORN_BIND`` (``0.0.0.0:$PORT``, port
+  8000 by default).
+
+The application is loaded once in the master and forked, and each worker
+then compiles every template, builds the URL resolver and connects to the
+databases before it accepts requests (see ``mooc_catalog/warmup.py``),
+so neither a deploy nor a recycled worker serves slow cold requests.
+
+With more than one worker, metrics are shared through
+``PROMETHEUS_MULTIPROC_DIR``; it defaults to a directory under the
+system temp directory and is emptied when the server starts. The server
+refuses to start several workers with ``CACHE_BACKEND=locmem``, whose
+per-process caches would miss other workers' invalidations.
+"""
+import glob
+import os
+import tempfile
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('true', '1', 'yes')
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+asgi = worker_class.startswith('uvicorn')
+
+if asgi:
+    wsgi_app = 'mooc_catalog.asgi:application'
+    os.environ.setdefault('ASYNC_VIEWS', 'True')
+else:
+    wsgi_app = 'mooc_catalog.wsgi:application'
+
+workers = _env_int(
+    'WEB_CONCURRENCY',
+    min(_cpu_count() * (1 if asgi else 2) + (0 if asgi else 1), _env_int('GUNICORN_MAX_WORKERS', 12)),
+)
+threads = 1 if asgi else _env_int('GUNICORN_THREADS', 2)
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+preload_app = _env_flag('GUNICORN_PRELOAD', 'True')
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = timeout
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+# Worker heartbeats go through this directory; keep them off a slow disk.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Set before the application (and prometheus_client) is loaded.
+if workers > 1:
+    os.environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'mooc-catalog-metrics'),
+    )
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    """
+    Check that the workers share a cache, and remove metric samples left by
+    a previous server, which would be merged into this one's.
+    """
+    if server.cfg.workers > 1 and os.environ.get('CACHE_BACKEND', 'file') == 'locmem':
+        raise RuntimeError(
+            f'{server.cfg.workers} workers cannot share the locmem cache; set CACHE_BACKEND '
+            'to file or db, or WEB_CONCURRENCY to 1.'
+        )
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        # The master's own files were just created by the preloaded app.
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            if not path.endswith(f'_{os.getpid()}.db'):
+                os.remove(path)
+
+
+def post_worker_init(worker):
+    """Warm the worker up once the application is loaded, before it accepts requests."""
+    from mooc_catalog import warmup
+
+    # Threaded workers serve requests from their pool, sync workers from
+    # this thread; uvicorn workers connect from threads made per request.
+    pool = getattr(worker, 'tpool', None)
+    stats = warmup.warm_up(connect=pool is None and not asgi)
+    threads_connected = warmup.open_connections_in(pool, worker.cfg.threads) if pool is not None else 0
+    worker.log.info(
+        'Worker %s warmed up: %s templates, %s URL names, %s connections, %s threads connected',
+        worker.pid, stats['templates'], stats['url_names'], stats['connections'], threads_connected,
+    )
+
+
+def worker_exit(server, worker):
+    """Write buffered lesson views and close connections as the worker exits."""
+    from django.apps import apps
+
+    if not apps.ready:
+        return
+    from django.db import connections
+    from courses import tracking
+
+    try:
+        tracking.flush()
+    finally:
+        connections.close_all()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,85 @@
+"""
+``DATABASE_URL`` parsing.
+
+Accepts ``postgres://`` and ``postgresql://`` URLs (user, password, host
+and port all optional, percent-encoded where needed, so a Unix socket
+directory can be given as the host) and ``sqlite:///path``.
+
+Connections are kept open between requests for ``conn_max_age`` seconds
+and checked before reuse, so requests normally skip connection and TLS
+setup. Settings can be overridden per URL in the query string:
+
+* ``conn_max_age``: seconds to keep a connection, ``0`` to close it after
+  every request or ``none`` to keep it indefinitely.
+* ``conn_health_checks``: ``true``/``false``.
+* ``disable_server_side_cursors``: ``true`` when connecting through
+  pgbouncer in transaction pooling mode, where a cursor can outlive the
+  server connection it was opened on. ``pgbouncer=true`` does the same.
+* Anything else (``sslmode``, ``connect_timeout``, ``application_name``,
+  ``options``, ...) is passed to the driver as a connection option.
+  ``sslmode`` defaults to ``require``.
+"""
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+POSTGRES_SCHEMES = ('postgres', 'postgresql', 'pgsql')
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+
+
+def _flag(value):
+    return value.lower() in TRUE_VALUES
+
+
+def _max_age(value):
+    if value.lower() == 'none':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f'conn_max_age must be a number of seconds or "none", not {value!r}')
+
+
+def parse_database_url(url, conn_max_age=0, conn_health_checks=False):
+    """Return a ``DATABASES`` entry for ``url``."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme == 'sqlite':
+        # sqlite:///relative.db and sqlite:////absolute/path.db
+        return {'ENGINE': 'django.db.backends.sqlite3', 'NAME': unquote(parts.path[1:]) or ':memory:'}
+    if scheme not in POSTGRES_SCHEMES:
+        raise ImproperlyConfigured(f'Unsupported DATABASE_URL scheme {parts.scheme!r}')
+
+    try:
+        port = parts.port
+    except ValueError:
+        raise ImproperlyConfigured('DATABASE_URL has an invalid port')
+    # A percent-encoded socket directory as the host keeps its case, which
+    # urlsplit's hostname would not.
+    hostinfo = parts.netloc.rpartition('@')[2]
+    if port:
+        hostinfo = hostinfo.rsplit(':', 1)[0]
+    host = unquote(hostinfo) if hostinfo.lower().startswith('%2f') else parts.hostname or ''
+
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': host,
+        'PORT': str(port or ''),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': conn_health_checks,
+        'OPTIONS': {'sslmode': 'require'},
+    }
+
+    for name, value in parse_qsl(parts.query):
+        if name == 'conn_max_age':
+            config['CONN_MAX_AGE'] = _max_age(value)
+        elif name == 'conn_health_checks':
+            config['CONN_HEALTH_CHECKS'] = _flag(value)
+        elif name in ('disable_server_side_cursors', 'pgbouncer'):
+            config['DISABLE_SERVER_SIDE_CURSORS'] = _flag(value)
+        else:
+            config['OPTIONS'][name] = value
+    return config
@@ -4,8 +4,11 @@ Django settings for mooc_catalog project.
 
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
+from .database import parse_database_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -35,6 +38,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'courses.middleware.RequestProfilingMiddleware',
+    'courses.routers.PrimaryReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,33 +69,18 @@ TEMPLATES = [
 WSGI_APPLICATION = 'mooc_catalog.wsgi.application'
 
 # Database configuration
+# See mooc_catalog/database.py for the DATABASE_URL options. Connections
+# are reused for DB_CONN_MAX_AGE seconds and health-checked before reuse.
 DATABASE_URL = os.environ.get('DATABASE_URL')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 'yes')
 
 if DATABASE_URL:
-    # Parse DATABASE_URL for PostgreSQL
-    import re
-    match = re.match(r'^postgres://([^:]+):([^@]+)@([^:]+):(\d+)/([^?]+)', DATABASE_URL)
-    if match:
-        DATABASES = {
-            'default': {
-                'ENGINE': 'django.db.backends.postgresql',
-                'NAME': match.group(5),
-                'USER': match.group(1),
-                'PASSWORD': match.group(2),
-                'HOST': match.group(3),
-                'PORT': match.group(4),
-                'OPTIONS': {
-                    'sslmode': 'require',
-                }
-            }
-        }
-    else:
-        DATABASES = {
-            'default': {
-                'ENGINE': 'django.db.backends.sqlite3',
-                'NAME': BASE_DIR / 'db.sqlite3',
-            }
-        }
+    DATABASES = {
+        'default': parse_database_url(
+            DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        )
+    }
 else:
     # Default to SQLite for local development
     DATABASES = {
@@ -100,6 +90,115 @@ else:
         }
     }
 
+# Read replicas
+# DATABASE_REPLICA_URLS is a comma-separated list of replica URLs, in the
+# DATABASE_URL format. Safe requests read from a random replica; writes, and
+# reads for REPLICA_STICKY_SECONDS after a client wrote, go to the primary.
+# See courses/routers.py.
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica_{number}'] = {
+        **parse_database_url(
+            url.strip(), conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        ),
+        # Tests run against the primary's test database only.
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['courses.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Cache
+# CACHE_BACKEND and PAGE_CACHE_BACKEND pick 'file', 'db' or 'locmem' for the
+# default cache and the anonymous page cache. The default cache holds the
+# object versions that invalidate fragments, pages and ETags, so every
+# process that serves or changes data must share it: 'file' (the default)
+# is shared on one host, 'db' (after createcachetable) across hosts.
+# 'locmem' lives inside one process; use it only with a single worker.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', CACHE_BACKEND)
+# Whether every process sees the same versions, which the page cache and
+# write-behind tracking rely on.
+CACHE_SHARED = CACHE_BACKEND != 'locmem'
+
+
+def cache_config(backend, name):
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': Path(os.environ.get('CACHE_DIR', BASE_DIR / 'cache')) / name,
+            # Fragments are cached per course; the default of 300 would cull constantly.
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    if backend == 'db':
+        return {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': f'cache_{name}',
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'mooc-catalog-{name}',
+    }
+
+
+CACHES = {
+    'default': cache_config(CACHE_BACKEND, 'default'),
+    'pages': cache_config(PAGE_CACHE_BACKEND, 'pages'),
+}
+# Tests use empty in-process caches instead of the shared ones.
+TEST_RUNNER = 'mooc_catalog.test_runner.TestRunner'
+
+# Anonymous visitors are served whole pages from the 'pages' cache; off by
+# default with a per-process default cache, where other workers' edits
+# would not invalidate them.
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', str(CACHE_SHARED)).lower() in ('true', '1', 'yes')
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 60 * 60))
+
+# Cached template fragments are keyed by object version, so they can live long.
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Lesson view tracking: buffer views per process and write them in bulk
+# instead of one get_or_create per lesson page view.
+LESSON_PROGRESS_WRITE_BEHIND = os.environ.get('LESSON_PROGRESS_WRITE_BEHIND', 'False').lower() in ('true', '1', 'yes')
+LESSON_PROGRESS_BUFFER_SIZE = int(os.environ.get('LESSON_PROGRESS_BUFFER_SIZE', 500))
+LESSON_PROGRESS_FLUSH_INTERVAL = float(os.environ.get('LESSON_PROGRESS_FLUSH_INTERVAL', 5))
+# Buffered views are shown from the default cache until they are written.
+if LESSON_PROGRESS_WRITE_BEHIND and not CACHE_SHARED:
+    raise ImproperlyConfigured(
+        'LESSON_PROGRESS_WRITE_BEHIND needs a cache shared by every worker; set CACHE_BACKEND to file or db.'
+    )
+
+# Serve the catalog and progress pages from courses.async_views (for ASGI
+# workers), running their independent queries concurrently unless
+# ASYNC_CONCURRENT_QUERIES is off.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() in ('true', '1', 'yes')
+ASYNC_CONCURRENT_QUERIES = os.environ.get('ASYNC_CONCURRENT_QUERIES', 'True').lower() in ('true', '1', 'yes')
+
+# Request profiling: Server-Timing headers and a log of slow requests.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'True').lower() in ('true', '1', 'yes')
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 500))
+# Server-Timing goes to staff users (and everyone with DEBUG) unless this is on.
+SERVER_TIMING_PUBLIC = os.environ.get('SERVER_TIMING_PUBLIC', 'False').lower() in ('true', '1', 'yes')
+
+# Bearer token required to scrape /metrics; without one it is only served with DEBUG.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'courses.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -127,6 +226,25 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# With STATIC_MANIFEST (on unless DEBUG), collectstatic writes content-hashed
+# copies of every file plus brotli and gzip versions, templates link the
+# hashed names and WhiteNoise serves them with far-future cache headers. It
+# needs a collectstatic run before the server (or the test suite) starts.
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST', str(not DEBUG)).lower() in ('true', '1', 'yes')
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+# A name missing from the manifest is linked unhashed instead of failing the page.
+WHITENOISE_MANIFEST_STRICT = False
+
 # Media files (User uploads)
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
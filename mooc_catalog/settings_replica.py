@@ -0,0 +1,28 @@
+"""
+Settings with a second SQLite database standing in for a read replica.
+
+Nothing replicates between the two files, so a read that was routed to
+the replica does not see rows written to the primary. That makes the
+routing visible without a database cluster:
+
+    python manage.py test courses.tests.ReplicaRoutingTest --settings=mooc_catalog.settings_replica
+
+To browse with it locally, migrate both databases:
+
+    python manage.py migrate --settings=mooc_catalog.settings_replica
+    python manage.py migrate --database=replica --settings=mooc_catalog.settings_replica
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+}
+DATABASE_REPLICAS = ['replica']
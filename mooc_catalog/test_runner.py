@@ -0,0 +1,33 @@
+"""
+Test runner that gives the test suite caches of its own.
+
+The shared caches outlive a test run, and cached fragments and versions
+keyed by primary key would leak from one run (or from a development
+server) into the next, so the tests run against empty in-process caches.
+``benchmark_views`` uses the same caches for its throwaway database.
+"""
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def local_caches():
+    """Return an ``override_settings`` that swaps every cache for an empty locmem one."""
+    return override_settings(CACHES={
+        alias: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'mooc-catalog-test-{alias}',
+        }
+        for alias in settings.CACHES
+    })
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = local_caches()
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,88 @@
+"""
+Warming a server process before it takes traffic.
+
+Django compiles templates, builds the URL resolver and connects to the
+database on first use, so the first requests a new worker serves are
+slow. :func:`warm_up` does all three up front; ``gunicorn.conf.py`` calls
+it in every worker once the application is loaded, and
+:func:`open_connections_in` does the connection part on each thread of a
+threaded worker's pool, since connections belong to the thread that
+opened them.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import wait
+
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """Yield the name of every template file ``engine`` can load."""
+    for directory in engine.template_dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.startswith('.'):
+                    yield os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+
+
+def compile_templates():
+    """Compile every template into the engines' cached loaders; return how many."""
+    compiled = 0
+    for engine in engines.all():
+        for name in set(template_names(engine)):
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError) as exc:
+                # Not every file in a template directory is a template.
+                logger.debug('Skipped %s while warming up: %s', name, exc)
+            else:
+                compiled += 1
+    return compiled
+
+
+def resolve_urls():
+    """Build the URL resolver and compile its patterns; return the number of names."""
+    return len(get_resolver().reverse_dict)
+
+
+def open_connections():
+    """Connect to every configured database from this thread; return how many."""
+    for connection in connections.all():
+        connection.ensure_connection()
+    return len(connections.all())
+
+
+def open_connections_in(pool, size, timeout=10):
+    """
+    Open connections on each of ``size`` threads of the executor ``pool``;
+    return how many threads connected.
+    """
+    # The barrier holds every task until all have started, so each lands on its own thread.
+    barrier = threading.Barrier(size, timeout=timeout)
+
+    def connect():
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        return open_connections()
+
+    done, _ = wait([pool.submit(connect) for _ in range(size)], timeout=timeout)
+    return sum(1 for future in done if future.exception() is None)
+
+
+def warm_up(connect=True):
+    """
+    Compile templates, resolve URLs and, with ``connect``, connect from
+    this thread; return what was done.
+    """
+    return {
+        'templates': compile_templates(),
+        'url_names': resolve_urls(),
+        'connections': open_connections() if connect else 0,
+    }